@@ -1,4 +1,6 @@
-from google.generativeai.types import GenerateContentResponse
+from verdict_cache import cached_verdict
+from metrics import FALLBACKS, time_upstream
+from upstream_guard import gemini_guard, UpstreamUnavailable
 
 def detect_unsafe_content(model: 'GenerativeModel', message: str) -> bool:
     """
@@ -14,10 +16,19 @@ def detect_unsafe_content(model: 'GenerativeModel', message: str) -> bool:
     Respond only with 'safe' or 'unsafe'.
     Message: {message}
     """
-    try:
-        response: GenerateContentResponse = model.generate_content(prompt)
+    def ask_model(_message):
+        with gemini_guard.protect(), time_upstream('gemini', 'moderation_prompt'):
+            response: 'GenerateContentResponse' = model.generate_content(prompt)
         result = response.text.strip().lower()
         return result == 'unsafe'
+
+    try:
+        return cached_verdict('prompt', message, ask_model)
+    except UpstreamUnavailable as e:
+        print(f"Skipping AI detection: {e}")
+        FALLBACKS.inc('ai_detector', 'upstream_unavailable')
+        return False
     except Exception as e:
         print(f"Error in AI detection: {e}")
+        FALLBACKS.inc('ai_detector', 'error')
         return False
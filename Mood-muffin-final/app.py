@@ -1,19 +1,36 @@
 # app.py (ALL ROUTES IN ONE FILE, NO BLUEPRINTS)
 
-from flask import Flask, render_template, redirect, request, jsonify, session
-from flask_socketio import SocketIO, join_room, leave_room
-import os, time, uuid
+from flask import Flask, Response, g, render_template, redirect, request, jsonify, session
+from flask_socketio import SocketIO
+import math, os, time, uuid
 from threading import Lock
 from dotenv import load_dotenv
 
-# Gemini imports
-from google.generativeai import configure, GenerativeModel
-from google.generativeai.types import HarmCategory, HarmBlockThreshold, GenerateContentResponse
-
-# Spotify imports
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-import requests
+# The Gemini SDK and spotipy are slow to import, so they are only loaded
+# when first needed (see gemini_client.py and the Spotify helpers below)
+from gemini_client import LazyModel
+
+from moderation_pipeline import ModerationPipeline
+from chat_state import create_chat_state, WAITING_TTL_SECONDS
+from game_sessions import GameStore
+from verdict_cache import cached_verdict, verdict_cache
+from keyword_matcher import load_matcher
+from sentiment_analysis import analyze_sentiment_with_gemini, analyze_sentiment_batch, sentiment_cache, SENTIMENT_BATCH_MAX_ENTRIES
+from local_sentiment import classify_sentiment, LOCAL_SENTIMENT_MIN_CONFIDENCE
+from spotify_client_pool import SpotifyClientPool, active_devices
+from playlist_builder import build_journey_playlists, catalog_search_names, prewarm_playlist_cache, playlist_cache
+from music_therapy import create_emotional_journey_plan, get_stage_for_emotion, watch_catalog
+from journal_store import JournalStore
+from journal_live import LiveJournal, ParagraphLabel, DeltaRejected
+from static_assets import AssetManifest, PageCache, ASSET_CACHE_CONTROL, PAGE_CACHE_CONTROL
+import metrics
+from metrics import time_upstream, timed_event
+from upstream_guard import gemini_guard, UpstreamUnavailable
+from profiling import Profiler, ProfilerBusy, check_admin_token, MODES as PROFILE_MODES, PROFILE_MAX_SECONDS
+from rate_limiter import (
+    TokenBucketLimiter, CHAT_RATE_PER_SID, CHAT_BURST_PER_SID, CHAT_RATE_PER_IP, CHAT_BURST_PER_IP,
+    AI_ROUTE_RATE_PER_IP, AI_ROUTE_BURST_PER_IP
+)
 
 # -----------------------
 # Load environment variables
@@ -24,45 +41,181 @@ SPOTIPY_CLIENT_ID = os.getenv("SPOTIPY_CLIENT_ID")
 SPOTIPY_CLIENT_SECRET = os.getenv("SPOTIPY_CLIENT_SECRET")
 SPOTIPY_REDIRECT_URI = "http://localhost:5000/callback"   # you can change this if needed
 
+# 'threading' for the dev server below. serve.py switches to 'gevent' after
+# monkey-patching, so sockets, locks and worker threads all become greenlets.
+ASYNC_MODE = os.getenv("ASYNC_MODE", "threading")
+
+# Chat moderation runs on a worker pool so a slow Gemini call never blocks relaying.
+# Green workers are cheap, so async mode runs more of them (the Gemini guard still caps calls).
+MODERATION_WORKERS = int(os.getenv("MODERATION_WORKERS", "64" if ASYNC_MODE == "gevent" else "4"))
+MODERATION_MAX_PENDING = int(os.getenv("MODERATION_MAX_PENDING", "1000"))
+MODERATION_DEADLINE_SECONDS = float(os.getenv("MODERATION_DEADLINE_SECONDS", "3"))
+MODERATION_TIMEOUT_POLICY = os.getenv("MODERATION_TIMEOUT_POLICY", "block")   # 'block' or 'allow'
+# A hung safety check gives its pool thread back after this long, even though its verdict is long overdue
+MODERATION_CHECK_TIMEOUT_SECONDS = float(os.getenv("MODERATION_CHECK_TIMEOUT_SECONDS", "10"))
+
+# Chat state: 'memory' for a single process, 'redis' to share it between workers/nodes
+CHAT_STATE_BACKEND = os.getenv("CHAT_STATE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or (REDIS_URL if CHAT_STATE_BACKEND == "redis" else None)
+
+# Markets whose journey playlists are looked up at startup (comma separated, empty to skip)
+PLAYLIST_PREWARM_MARKETS = [m for m in os.getenv("PLAYLIST_PREWARM_MARKETS", "US").split(",") if m]
+
+# Not fatal: every Gemini caller already has a fallback for when the model can't be reached
 if not GEMINI_API_KEY:
-    raise ValueError("🚨 GEMINI_API_KEY environment variable not set")
+    print("⚠️ GEMINI_API_KEY environment variable not set, Gemini features will use their fallbacks")
 
 # -----------------------
 # Initialize Flask + SocketIO
 # -----------------------
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Workers must share the key or a session cookie from one is rejected by the others
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(24)
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE, async_mode=ASYNC_MODE)
+
+# -----------------------
+# Static assets and cached pages
+# -----------------------
+# Fingerprinted and precompressed once at startup, see static_assets.py
+asset_manifest = AssetManifest()
+page_cache = PageCache()
+asset_stats = asset_manifest.stats()
+print(f"Fingerprinted {asset_stats['assets']} static assets ({asset_stats['bytes']})")
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': asset_manifest.url}
+
+@app.route('/assets/<path:path>')
+def static_asset(path):
+    asset = asset_manifest.get(path)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset.response(ASSET_CACHE_CONTROL)
+
+def cached_page(template, **context):
+    """
+    Renders a page that only depends on its template and fixed context once,
+    then serves the stored copy. Re-renders every time in debug mode.
+    """
+    key = (template, tuple(sorted(context.items())))
+    page = page_cache.get(key, lambda: render_template(template, **context), enabled=not app.debug)
+    return page.response(PAGE_CACHE_CONTROL)
+
+# -----------------------
+# Metrics
+# -----------------------
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+metrics.Callback(
+    'cache_lookups_total', 'Cache hits and misses', lambda: [
+        ((name, result), cache.stats()[result])
+        for name, cache in (('moderation_verdicts', verdict_cache), ('sentiment', sentiment_cache), ('playlists', playlist_cache))
+        for result in ('hits', 'misses')
+    ], labelnames=('cache', 'result'), kind='counter'
+)
+metrics.Callback(
+    'upstream_guard_limit', 'Concurrent calls the upstream guard currently allows',
+    lambda: [(('gemini',), gemini_guard.snapshot()['limit'])], labelnames=('service',)
+)
+metrics.Callback(
+    'upstream_guard_in_flight', 'Calls currently running through the upstream guard',
+    lambda: [(('gemini',), gemini_guard.snapshot()['in_flight'])], labelnames=('service',)
+)
+metrics.Callback(
+    'upstream_circuit_state', 'Circuit breaker state, 1 for the current one',
+    lambda: [
+        (('gemini', state), int(gemini_guard.snapshot()['state'] == state))
+        for state in ('closed', 'open', 'half_open')
+    ], labelnames=('service', 'state')
+)
 
 # -----------------------
 # Gemini Config
 # -----------------------
-configure(api_key=GEMINI_API_KEY)
-gemini_model = GenerativeModel('gemini-1.5-flash')
+# Configured on first use, so workers boot without importing the SDK
+gemini_model = LazyModel()
 
 # -----------------------
 # Spotify Helpers
 # -----------------------
-def get_spotify_oauth():
+def get_spotify_oauth(cache_handler=None):
+    from spotipy.oauth2 import SpotifyOAuth
     return SpotifyOAuth(
         client_id=SPOTIPY_CLIENT_ID,
         client_secret=SPOTIPY_CLIENT_SECRET,
         redirect_uri=SPOTIPY_REDIRECT_URI,
-        scope="user-read-email user-read-playback-state user-modify-playback-state streaming"
+        scope="user-read-email user-read-playback-state user-modify-playback-state streaming",
+        cache_handler=cache_handler
     )
 
+spotify_pool = SpotifyClientPool(get_spotify_oauth)
+
 def get_spotify_client():
     token_info = session.get("spotify_token_info", None)
     if not token_info:
         return None
-    return spotipy.Spotify(auth=token_info.get("access_token"))
+    if 'spotify_user_key' not in session:
+        session['spotify_user_key'] = str(uuid.uuid4())
+    user_key = session['spotify_user_key']
+    sp = spotify_pool.get(user_key, token_info)
+    # The pool refreshes tokens in the background, keep the cookie in step
+    latest = spotify_pool.token_info(user_key)
+    if latest and latest.get('access_token') != token_info.get('access_token'):
+        session['spotify_token_info'] = latest
+    return sp
+
+def prewarm_playlists():
+    if not catalog_search_names():
+        return
+    # Search works with app-only credentials, no user login needed
+    try:
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+            client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET
+        ))
+        searched = prewarm_playlist_cache(sp, PLAYLIST_PREWARM_MARKETS)
+        print(f"Playlist cache warmed for {PLAYLIST_PREWARM_MARKETS} ({searched} searches)")
+    except Exception as e:
+        print(f"Could not pre-warm playlist cache: {e}")
+
+if SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET and PLAYLIST_PREWARM_MARKETS:
+    socketio.start_background_task(prewarm_playlists)
+
+# Editors can change journeys.json on a live server, every worker picks it up
+watch_catalog()
+
+def socket_event(event):
+    """
+    Registers a Socket.IO handler and records its latency in /metrics.
+    """
+    def decorator(handler):
+        socketio.on(event)(timed_event(event)(handler))
+        return handler
+    return decorator
 
 # -----------------------
 # Dashboard Routes
 # -----------------------
 @app.route('/')
 def home():
-    return render_template("dashboard.html", user="User")
+    return cached_page("dashboard.html", user="User")
 
 @app.route('/chat')
 def chat():
@@ -81,109 +234,175 @@ def add():
 # -----------------------
 @app.route('/aichat')
 def aichat():
-    return render_template("aichat.html")
+    return cached_page("aichat.html")
 
-waiting_queue = []
-pairs = {}
-lock = Lock()
+matchmaker = create_chat_state(CHAT_STATE_BACKEND, REDIS_URL)
+chat_heartbeat_lock = Lock()
+chat_heartbeat_started = False
 
-def detect_unsafe_content(model: GenerativeModel, message: str) -> bool:
+def run_chat_heartbeat():
+    # Shared chat state drops waiting sids nobody refreshes, e.g. a crashed worker's
+    while True:
+        socketio.sleep(WAITING_TTL_SECONDS / 3)
+        try:
+            matchmaker.refresh_waiting()
+        except Exception as e:
+            print(f"Could not refresh waiting chat users: {e}")
+
+def ensure_chat_heartbeat():
+    global chat_heartbeat_started
+    # Only the Redis backend needs it, the in-memory Matchmaker dies with its sids
+    if not hasattr(matchmaker, 'refresh_waiting'):
+        return
+    with chat_heartbeat_lock:
+        if not chat_heartbeat_started:
+            socketio.start_background_task(run_chat_heartbeat)
+            chat_heartbeat_started = True
+
+def check_safety_ratings(model: 'GenerativeModel', message: str) -> bool:
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    with gemini_guard.protect(), time_upstream('gemini', 'safety_check'):
+        response: 'GenerateContentResponse' = model.generate_content(
+            message,
+            safety_settings={
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH
+            },
+            request_options={'timeout': MODERATION_CHECK_TIMEOUT_SECONDS}
+        )
+    if not response.candidates:
+        return True
+    for rating in response.prompt_feedback.safety_ratings:
+        if rating.category == HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT and rating.probability >= 0.8:
+            return True
+    return False
+
+# Compiled once from moderation_phrases.json, only messages it matches get the model check
+moderation_matcher = load_matcher()
+
+def needs_safety_check(message: str) -> bool:
+    # Runs inline on the moderation worker, only matched messages wait for a check slot
+    categories = moderation_matcher.scan(message)
+    for category in categories:
+        metrics.KEYWORD_MATCHES.inc(category)
+    return bool(categories)
+
+def detect_unsafe_content(model: 'GenerativeModel', message: str) -> bool:
     try:
-        keywords = [
-            "kill myself", "end my life", "hurt myself", "self harm", "suicide",
-            "cut myself", "want to die", "no reason to live", "take my life"
-        ]
-        message_lower = message.lower()
-        if any(kw in message_lower for kw in keywords):
-            response: GenerateContentResponse = model.generate_content(
-                message,
-                safety_settings={
-                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH
-                }
-            )
-            if not response.candidates:
-                return True
-            for rating in response.prompt_feedback.safety_ratings:
-                if rating.category == HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT and rating.probability >= 0.8:
-                    return True
-        return False
+        # Repeated messages reuse the model's verdict instead of another Gemini call
+        return cached_verdict('safety_ratings', message, lambda m: check_safety_ratings(model, m))
+    except UpstreamUnavailable as e:
+        # Same verdict as any other checker failure, just without the wait
+        print(f"Skipping content safety check: {e}")
+        metrics.FALLBACKS.inc('chat_moderation', 'upstream_unavailable')
+        return True
     except Exception as e:
         print(f"Error in content safety check: {e}")
+        metrics.FALLBACKS.inc('chat_moderation', 'error')
         return True
 
 @socketio.on('connect')
 def handle_connect():
     print(f"User connected: {request.sid}")
 
-@socketio.on('disconnect')
+@socket_event('disconnect')
 def handle_disconnect():
     print(f"User disconnected: {request.sid}")
-    with lock:
-        if request.sid in waiting_queue:
-            waiting_queue.remove(request.sid)
-        for room_id, users in list(pairs.items()):
-            if request.sid in users:
-                other_sid = [u for u in users if u != request.sid][0]
-                socketio.emit('stranger_disconnected', to=other_sid)
-                leave_room(room_id, request.sid)
-                leave_room(room_id, other_sid)
-                del pairs[room_id]
-                break
-
-@socketio.on('start_chat')
+    games.detach(request.sid)
+    # Off the disconnect handler, the last analysis may have to ask Gemini
+    socketio.start_background_task(close_live_journal, request.sid)
+    chat_sid_limiter.forget(request.sid)
+    ended = matchmaker.disconnect(request.sid)
+    if ended:
+        _, other_sid = ended
+        socketio.emit('stranger_disconnected', to=other_sid)
+
+@socket_event('start_chat')
 def start_chat():
     sid = request.sid
-    with lock:
-        waiting_queue.append(sid)
-        if len(waiting_queue) >= 2:
-            sid1 = waiting_queue.pop(0)
-            sid2 = waiting_queue.pop(0)
-            room_id = str(uuid.uuid4())
-            pairs[room_id] = [sid1, sid2]
-            join_room(room_id, sid=sid1)
-            join_room(room_id, sid=sid2)
-            socketio.emit('chat_started', {'room_id': room_id}, to=sid1)
-            socketio.emit('chat_started', {'room_id': room_id}, to=sid2)
-            socketio.emit('message', {'text': 'You are now connected to a stranger!'}, room=room_id)
-
-@socketio.on('send_message')
+    ensure_chat_heartbeat()
+    paired = matchmaker.enqueue(sid)
+    if paired:
+        room_id, sid1, sid2 = paired
+        # Emit per sid rather than to a Socket.IO room: the two sids may be
+        # connected to different workers, and rooms only exist per process.
+        for user_sid in (sid1, sid2):
+            socketio.emit('chat_started', {'room_id': room_id}, to=user_sid)
+            socketio.emit('message', {'text': 'You are now connected to a stranger!'}, to=user_sid)
+
+def relay_message(room_id, sid, message, unsafe):
+    if unsafe:
+        socketio.emit('message', {'text': '⚠️ Your message was flagged as unsafe and not sent.'}, to=sid)
+        return
+    other_sid = matchmaker.partner(room_id, sid)
+    if other_sid:
+        socketio.emit('message', {'text': message, 'from': 'stranger'}, to=other_sid)
+        socketio.emit('message', {'text': message, 'from': 'you'}, to=sid)
+
+moderation = ModerationPipeline(
+    check=lambda message: detect_unsafe_content(gemini_model, message),
+    relay=relay_message,
+    workers=MODERATION_WORKERS,
+    max_pending=MODERATION_MAX_PENDING,
+    deadline=MODERATION_DEADLINE_SECONDS,
+    on_timeout=MODERATION_TIMEOUT_POLICY,
+    screen=needs_safety_check
+)
+
+metrics.Callback('moderation_queue_depth', 'Chat messages waiting for a moderation verdict', moderation.pending)
+
+# Every flagged message costs a Gemini call, so one tab can't be allowed to flood
+chat_sid_limiter = TokenBucketLimiter(CHAT_RATE_PER_SID, CHAT_BURST_PER_SID)
+chat_ip_limiter = TokenBucketLimiter(CHAT_RATE_PER_IP, CHAT_BURST_PER_IP)
+
+@socket_event('send_message')
 def handle_message(data):
     room_id = data['room_id']
     message = data['message']
     sid = request.sid
-    if detect_unsafe_content(gemini_model, message):
-        socketio.emit('message', {'text': '⚠️ Your message was flagged as unsafe and not sent.'}, to=sid)
+    retry_after = chat_sid_limiter.acquire(sid) or chat_ip_limiter.acquire(request.remote_addr)
+    if retry_after:
+        metrics.RATE_LIMITED.inc('send_message')
+        socketio.emit('rate_limited', {'event': 'send_message', 'retry_after': round(retry_after, 2)}, to=sid)
         return
-    with lock:
-        if room_id in pairs and sid in pairs[room_id]:
-            other_sid = [u for u in pairs[room_id] if u != sid][0]
-            socketio.emit('message', {'text': message, 'from': 'stranger'}, to=other_sid)
-            socketio.emit('message', {'text': message, 'from': 'you'}, to=sid)
+    # Queue is full: drop the message and tell the sender instead of waiting
+    if not moderation.submit(room_id, sid, message):
+        metrics.MODERATION_VERDICTS.inc('rejected')
+        socketio.emit('message', {'text': '⏳ Chat is busy right now, your message was not sent. Please try again.'}, to=sid)
 
-@socketio.on('end_chat')
+@socket_event('end_chat')
 def end_chat(data):
     room_id = data['room_id']
     sid = request.sid
-    with lock:
-        if room_id in pairs and sid in pairs[room_id]:
-            other_sid = [u for u in pairs[room_id] if u != sid][0]
-            socketio.emit('stranger_disconnected', to=other_sid)
-            leave_room(room_id, sid)
-            leave_room(room_id, other_sid)
-            del pairs[room_id]
+    other_sid = matchmaker.end(room_id, sid)
+    if other_sid:
+        socketio.emit('stranger_disconnected', to=other_sid)
 
 # -----------------------
 # Journalling Routes
 # -----------------------
+# Every analyzed entry is kept, with daily/weekly mood rollups for the timeline
+journal_store = JournalStore()
+JOURNAL_ENTRY_ID_MAX_LENGTH = 64
+
+def current_journal_user():
+    # No accounts yet: a long-lived cookie identifies the journal across visits and Spotify logins
+    if 'journal_user_id' not in session:
+        session.permanent = True
+        session['journal_user_id'] = str(uuid.uuid4())
+    return session['journal_user_id']
+
 @app.route('/journalling')
 def journalling():
     sp = get_spotify_client()
     user_profile = None
     if sp:
         try:
-            user_profile = sp.current_user()
+            with time_upstream('spotify', 'current_user'):
+                user_profile = sp.current_user()
         except Exception:
             session.clear()
+    # Set the cookie now, the live journal socket can only read it
+    current_journal_user()
     return render_template('journal.html', user_profile=user_profile)
 
 @app.route('/login')
@@ -193,30 +412,227 @@ def login():
 
 @app.route('/callback')
 def callback():
-    token_info = get_spotify_oauth().get_access_token(request.args.get('code'))
+    with time_upstream('spotify', 'get_access_token'):
+        token_info = get_spotify_oauth().get_access_token(request.args.get('code'))
     session['spotify_token_info'] = token_info
+    # A fresh login gets a fresh pooled client
+    session['spotify_user_key'] = str(uuid.uuid4())
     return redirect('/journalling')
 
 @app.route('/logout')
 def logout():
+    if 'spotify_user_key' in session:
+        spotify_pool.forget(session['spotify_user_key'])
     session.clear()
     return redirect('/journalling')
 
+def journal_entry_id(value):
+    """
+    The client's id for the entry being written, so saving it again replaces
+    the stored text instead of adding an entry. None if missing or malformed.
+    """
+    if isinstance(value, str) and 0 < len(value) <= JOURNAL_ENTRY_ID_MAX_LENGTH:
+        return value
+    return None
+
+# Shared by the sentiment routes, keyed by client IP
+ai_route_limiter = TokenBucketLimiter(AI_ROUTE_RATE_PER_IP, AI_ROUTE_BURST_PER_IP)
+
+def rate_limited_response(route, retry_after):
+    metrics.RATE_LIMITED.inc(route)
+    response = jsonify({'error': 'Too many requests, please slow down.', 'retry_after': round(retry_after, 2)})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
 @app.route('/analyze_sentiment', methods=['POST'])
 def analyze_sentiment():
+    retry_after = ai_route_limiter.acquire(request.remote_addr)
+    if retry_after:
+        return rate_limited_response('analyze_sentiment', retry_after)
     try:
         data = request.get_json()
         journal_text = data.get('text', '')
         if not journal_text:
             return jsonify({'error': 'No text provided'}), 400
-        # Just a placeholder sentiment
-        sentiment = "calm" if "happy" in journal_text.lower() else "stressed"
-        stage_name = "relaxation" if sentiment == "calm" else "uplifting"
-        return jsonify({'sentiment': sentiment, 'stage': stage_name})
+        entry_id = journal_entry_id(data.get('entry_id'))
+        # Score on-box first, only ask Gemini when the local scorer isn't sure
+        local = classify_sentiment(journal_text)
+        sentiment, confidence, source = local.label, local.confidence, 'local'
+        if local.confidence < LOCAL_SENTIMENT_MIN_CONFIDENCE:
+            metrics.SENTIMENT_OUTCOMES.inc('local', 'deferred')
+            result = analyze_sentiment_with_gemini(journal_text)
+            if isinstance(result, str):
+                sentiment, confidence, source = result, None, 'gemini'
+            else:
+                metrics.FALLBACKS.inc('analyze_sentiment', 'gemini_error')
+        else:
+            metrics.SENTIMENT_OUTCOMES.inc('local', 'ok')
+        try:
+            journal_store.append(current_journal_user(), journal_text, sentiment, source, entry_id=entry_id)
+        except Exception as e:
+            # The analysis still goes back to the user, only the history misses an entry
+            print(f"Could not store journal entry: {e}")
+            metrics.FALLBACKS.inc('journal_store', 'append_error')
+        return jsonify({
+            'sentiment': sentiment,
+            'stage': get_stage_for_emotion(sentiment),
+            'confidence': confidence,
+            'source': source
+        })
     except Exception as e:
         print(f"A critical error occurred in /analyze_sentiment: {e}")
         return jsonify({'error': 'An internal server error occurred'}), 500
 
+SENTIMENT_BATCH_MAX_REQUEST_ENTRIES = int(os.getenv("SENTIMENT_BATCH_MAX_REQUEST_ENTRIES", "500"))
+
+def label_entries(texts, client=None):
+    """
+    Same split as /analyze_sentiment for many texts at once: each is scored
+    on-box, and the unsure ones share batched Gemini calls. Returns one
+    ParagraphLabel per text.
+
+    With a `client` (the live journal's IP), each call that needs Gemini
+    costs one ai_route_limiter token and sends at most one batch worth of
+    entries. The rest keep their local label as a fallback.
+    """
+    labels = []
+    deferred = []
+    for i, text in enumerate(texts):
+        local = classify_sentiment(text)
+        labels.append(ParagraphLabel(local.label, local.confidence, 'local'))
+        if local.confidence < LOCAL_SENTIMENT_MIN_CONFIDENCE:
+            deferred.append(i)
+        else:
+            metrics.SENTIMENT_OUTCOMES.inc('local', 'ok')
+    if deferred and client is not None:
+        skipped, deferred = deferred[SENTIMENT_BATCH_MAX_ENTRIES:], deferred[:SENTIMENT_BATCH_MAX_ENTRIES]
+        if ai_route_limiter.acquire(client):
+            metrics.RATE_LIMITED.inc('journal_delta')
+            skipped, deferred = skipped + deferred, []
+        # Fallback labels aren't kept, so these get another try after the next edit
+        for i in skipped:
+            labels[i] = labels[i]._replace(source='fallback')
+    if deferred:
+        metrics.SENTIMENT_OUTCOMES.inc('local', 'deferred', amount=len(deferred))
+        for i, result in zip(deferred, analyze_sentiment_batch([texts[i] for i in deferred])):
+            if isinstance(result, str):
+                labels[i] = ParagraphLabel(result, None, 'gemini')
+            else:
+                metrics.FALLBACKS.inc('analyze_sentiment', 'gemini_error')
+                labels[i] = labels[i]._replace(source='fallback')
+    return labels
+
+@app.route('/analyze_sentiment_batch', methods=['POST'])
+def analyze_sentiment_batch_route():
+    try:
+        data = request.get_json()
+        texts = data.get('texts') if data else None
+        if not texts or not isinstance(texts, list) or not all(isinstance(t, str) and t for t in texts):
+            return jsonify({'error': 'texts must be a non-empty list of entries'}), 400
+        if len(texts) > SENTIMENT_BATCH_MAX_REQUEST_ENTRIES:
+            return jsonify({'error': f'At most {SENTIMENT_BATCH_MAX_REQUEST_ENTRIES} entries per request'}), 400
+        # Charged roughly per Gemini call the batch could turn into
+        cost = min(AI_ROUTE_BURST_PER_IP, 1 + len(texts) // SENTIMENT_BATCH_MAX_ENTRIES)
+        retry_after = ai_route_limiter.acquire(request.remote_addr, cost)
+        if retry_after:
+            return rate_limited_response('analyze_sentiment_batch', retry_after)
+
+        results = [{
+            'sentiment': label.label,
+            'stage': get_stage_for_emotion(label.label),
+            'confidence': label.confidence,
+            'source': 'gemini' if label.source == 'gemini' else 'local'
+        } for label in label_entries(texts)]
+        return jsonify({'results': results})
+    except Exception as e:
+        print(f"A critical error occurred in /analyze_sentiment_batch: {e}")
+        return jsonify({'error': 'An internal server error occurred'}), 500
+
+@app.route('/mood_timeline')
+def mood_timeline():
+    period = request.args.get('period', 'day')
+    if period not in ('day', 'week'):
+        return jsonify({'error': "period must be 'day' or 'week'"}), 400
+    since = request.args.get('since')
+    try:
+        timeline = journal_store.timeline(current_journal_user(), period, since)
+    except Exception as e:
+        print(f"A critical error occurred in /mood_timeline: {e}")
+        return jsonify({'error': 'An internal server error occurred'}), 500
+    return jsonify({'period': period, 'timeline': timeline})
+
+@app.route('/journal_export')
+def journal_export():
+    # Streamed page by page as NDJSON, so long histories never sit in memory
+    user_id = current_journal_user()
+    return Response(
+        journal_store.export(user_id), mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename="journal.ndjson"'}
+    )
+
+# Live analysis: the journal page streams text deltas over Socket.IO and only
+# changed paragraphs are re-analyzed, see journal_live.py
+JOURNAL_LIVE_TICK_SECONDS = 0.25
+
+live_journal = LiveJournal(label_paragraphs=label_entries)
+journal_analyzer_lock = Lock()
+journal_analyzer_started = False
+
+metrics.Callback('journal_live_documents', 'Journal documents open over Socket.IO', lambda: len(live_journal))
+
+def run_journal_analyzer():
+    """
+    One background loop for every live journal: hands documents whose
+    writer has paused to their own task, so a slow Gemini call for one
+    journal never delays the others.
+    """
+    while True:
+        socketio.sleep(JOURNAL_LIVE_TICK_SECONDS)
+        for sid in live_journal.due():
+            socketio.start_background_task(push_journal_sentiment, sid)
+
+def ensure_journal_analyzer():
+    global journal_analyzer_started
+    with journal_analyzer_lock:
+        if not journal_analyzer_started:
+            socketio.start_background_task(run_journal_analyzer)
+            journal_analyzer_started = True
+
+def push_journal_sentiment(sid):
+    try:
+        result = live_journal.analyze(sid)
+    except Exception as e:
+        print(f"Error in live journal analysis: {e}")
+        return
+    if result:
+        result['stage'] = get_stage_for_emotion(result['sentiment'])
+        socketio.emit('journal_sentiment', result, to=sid)
+
+def close_live_journal(sid):
+    # The finished entry goes into the history, labelled from its final text. Stored under the
+    # client's entry id, so the same entry sent again after a reconnect replaces it instead of adding one
+    doc, result = live_journal.finish(sid)
+    if doc and doc.user_id and result:
+        try:
+            journal_store.append(doc.user_id, doc.text.strip(), result['sentiment'], 'live',
+                                 entry_id=journal_entry_id(doc.entry_id))
+        except Exception as e:
+            print(f"Could not store journal entry: {e}")
+            metrics.FALLBACKS.inc('journal_store', 'append_error')
+
+@socket_event('journal_delta')
+def journal_delta(data):
+    sid = request.sid
+    try:
+        live_journal.apply_delta(sid, session.get('journal_user_id'), data or {}, client=request.remote_addr or sid)
+    except DeltaRejected as e:
+        if e.reason == 'version':
+            socketio.emit('journal_resync', to=sid)
+        else:
+            socketio.emit('journal_error', {'reason': e.reason, 'error': str(e)}, to=sid)
+        return
+    ensure_journal_analyzer()
+
 @app.route('/create_journey', methods=['POST'])
 def create_journey():
     sp_client = get_spotify_client()
@@ -227,11 +643,12 @@ def create_journey():
         sentiment = data.get('sentiment', '')
         if not sentiment:
             return jsonify({'error': 'No sentiment provided'}), 400
-        journey_playlists = [
-            {"label": "Stage 1", "playlist_uri": "spotify:playlist:example1"},
-            {"label": "Stage 2", "playlist_uri": "spotify:playlist:example2"},
-            {"label": "Stage 3", "playlist_uri": "spotify:playlist:example3"}
-        ]
+        journey_playlists = build_journey_playlists(sp_client, sentiment)
+        if not journey_playlists:
+            journey_playlists = [
+                {'label': stage['label'], 'playlist_uri': stage['playlist_uri']}
+                for stage in create_emotional_journey_plan(sentiment)
+            ]
         return jsonify({'journey': journey_playlists})
     except Exception as e:
         print(f"A critical error occurred in /create_journey: {e}")
@@ -239,7 +656,7 @@ def create_journey():
 
 @app.route('/get_token')
 def get_token():
-    token_info = session.get('spotify_token_info', None)
+    token_info = spotify_pool.token_info(session.get('spotify_user_key')) or session.get('spotify_token_info', None)
     if not token_info:
         return jsonify({'error': 'User not logged in'}), 401
     return jsonify({'access_token': token_info.get('access_token')})
@@ -255,63 +672,155 @@ def play_song():
         device_id = data.get('device_id')
         if not playlist_uri or not device_id:
             return jsonify({'error': 'Playlist URI and Device ID are required.'}), 400
-        sp_client.transfer_playback(device_id=device_id, force_play=True)
-        sp_client.start_playback(device_id=device_id, context_uri=playlist_uri)
+        user_key = session.get('spotify_user_key')
+        # Only move playback when the device isn't already the active one
+        if active_devices.get(user_key) != device_id:
+            with time_upstream('spotify', 'transfer_playback'):
+                sp_client.transfer_playback(device_id=device_id, force_play=True)
+        with time_upstream('spotify', 'start_playback'):
+            sp_client.start_playback(device_id=device_id, context_uri=playlist_uri)
+        active_devices.set(user_key, device_id)
         return jsonify({'status': 'success'})
     except Exception as e:
+        active_devices.delete(session.get('spotify_user_key'))
         print(f"A critical error occurred in /play: {e}")
         return jsonify({'error': f'Could not start playback: {str(e)}'}), 500
 
 # -----------------------
 # Whack-a-Mole Game Routes
 # -----------------------
-game_state = {
-    'score': 0,
-    'game_over': False,
-    'start_time': None,
-    'game_duration': 30
-}
+GAME_DURATION_SECONDS = 30
+GAME_SWEEP_INTERVAL_SECONDS = 60
+
+games = GameStore(duration=GAME_DURATION_SECONDS)
+game_clock_lock = Lock()
+game_clock_started = False
+
+def run_game_clock():
+    """
+    One background loop for every game: pushes time left each second and
+    game over when time runs out, and sweeps abandoned games now and then.
+    """
+    last_sweep = time.time()
+    while True:
+        socketio.sleep(1)
+        now = time.time()
+        running, finished = games.tick(now)
+        for sid, game in running:
+            socketio.emit('game_tick', game.to_dict(now), to=sid)
+        for sid, game in finished:
+            socketio.emit('game_over', game.to_dict(now), to=sid)
+        if now - last_sweep >= GAME_SWEEP_INTERVAL_SECONDS:
+            games.sweep(now)
+            last_sweep = now
+
+def ensure_game_clock():
+    global game_clock_started
+    with game_clock_lock:
+        if not game_clock_started:
+            socketio.start_background_task(run_game_clock)
+            game_clock_started = True
+
+def current_game_id():
+    if 'game_id' not in session:
+        session['game_id'] = str(uuid.uuid4())
+    return session['game_id']
 
 @app.route('/whack-a-mole')
 def mole_index():
-    return render_template('mole.html')
+    return cached_page('mole.html')
 
 @app.route('/start_game', methods=['POST'])
 def start_game():
-    global game_state
-    game_state = {
-        'score': 0,
-        'game_over': False,
-        'start_time': time.time(),
-        'game_duration': 30
-    }
-    return jsonify({'status': 'started', 'score': game_state['score']})
+    game_id = current_game_id()
+    game = games.start(game_id)
+    ensure_game_clock()
+    return jsonify({'status': 'started', 'score': game.score, 'game_id': game_id})
 
 @app.route('/hit_mole', methods=['POST'])
 def hit_mole():
-    global game_state
-    if not game_state['game_over']:
-        game_state['score'] += 1
-        return jsonify({'status': 'hit', 'score': game_state['score']})
-    return jsonify({'status': 'game_over', 'score': game_state['score']})
+    game, scored = games.hit(session.get('game_id'))
+    if scored:
+        return jsonify({'status': 'hit', 'score': game.score})
+    return jsonify({'status': 'game_over', 'score': game.score if game else 0})
 
 @app.route('/game_status', methods=['GET'])
 def game_status():
-    global game_state
-    if game_state['start_time']:
-        elapsed_time = time.time() - game_state['start_time']
-        time_left = max(0, game_state['game_duration'] - elapsed_time)
-        if time_left <= 0:
-            game_state['game_over'] = True
-        return jsonify({
-            'score': game_state['score'],
-            'time_left': round(time_left),
-            'game_over': game_state['game_over']
-        })
-    return jsonify({'score': 0, 'time_left': game_state['game_duration'], 'game_over': True})
+    # Kept for old clients, the game page now gets updates over Socket.IO
+    game = games.get(session.get('game_id'))
+    if game:
+        return jsonify(game.to_dict(time.time()))
+    return jsonify({'score': 0, 'time_left': GAME_DURATION_SECONDS, 'game_over': True})
+
+@socket_event('join_game')
+def join_game(data):
+    game = games.attach(data.get('game_id'), request.sid)
+    if game:
+        ensure_game_clock()
+        state = game.to_dict(time.time())
+        # A game that ended while no socket was attached was never pushed to anyone
+        socketio.emit('game_over' if state['game_over'] else 'game_tick', state, to=request.sid)
+
+# -----------------------
+# Admin
+# -----------------------
+profiler = Profiler()
+
+def profile_targets():
+    """
+    Everything /admin/profile can wrap: route rules, 'socket:<event>' for
+    Socket.IO handlers, and 'moderation' for the moderation check workers.
+    """
+    targets = {
+        rule.rule: (app.view_functions, rule.endpoint)
+        for rule in app.url_map.iter_rules() if rule.endpoint not in ('static', 'admin_profile')
+    }
+    handlers = socketio.server.handlers.get('/', {})
+    for event in handlers:
+        targets[f"socket:{event}"] = (handlers, event)
+    targets['moderation'] = (moderation, 'check')
+    return targets
+
+def chat_state_locks():
+    # Only the in-memory Matchmaker has locks, the Redis backend uses WATCH/MULTI
+    if not hasattr(matchmaker, '_queue_lock'):
+        return {}
+    return {'matchmaker_queue': (matchmaker, '_queue_lock'), 'matchmaker_rooms': (matchmaker, '_rooms_lock')}
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """
+    Profiles the comma separated `target`s for `seconds` and returns pstats
+    text (mode=cprofile, `sample` = fraction of calls) or collapsed stacks
+    (mode=stack). Chat state lock waits and holds are recorded meanwhile.
+    Needs "Authorization: Bearer $ADMIN_TOKEN", and only profiles this worker.
+    """
+    # Looks like any unknown URL unless ADMIN_TOKEN is set and sent
+    if not check_admin_token(request.headers.get('Authorization')):
+        return jsonify({'error': 'Not found'}), 404
+    targets = profile_targets()
+    names = [name for name in request.args.get('target', '').split(',') if name]
+    if not names or any(name not in targets for name in names):
+        return jsonify({'error': 'Unknown or missing target', 'targets': sorted(targets)}), 400
+    mode = request.args.get('mode', 'cprofile')
+    if mode not in PROFILE_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(PROFILE_MODES)}"}), 400
+    if mode == 'stack' and ASYNC_MODE == 'gevent':
+        return jsonify({'error': 'Stack sampling needs OS threads, use mode=cprofile under gevent'}), 400
+    try:
+        seconds = min(max(float(request.args.get('seconds', 10)), 0.1), PROFILE_MAX_SECONDS)
+        sample = min(max(float(request.args.get('sample', 1)), 0.0), 1.0)
+    except ValueError:
+        return jsonify({'error': 'seconds and sample must be numbers'}), 400
+    try:
+        report = profiler.run({name: targets[name] for name in names}, chat_state_locks(), mode, seconds, sample)
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    return Response(report, mimetype='text/plain')
 
 # -----------------------
 # Run Unified App
 # -----------------------
+# Development server. For production run serve.py (see README).
 if __name__ == "__main__":
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,162 @@
+# benchmarks/async_smoke.py
+"""
+Smoke test for the gevent production mode (serve.py), fully offline.
+
+Run from Mood-muffin-final/:
+
+    python benchmarks/async_smoke.py
+    python benchmarks/async_smoke.py --connections 3000 --requests 1000 --gemini-latency-ms 500
+
+Starts serve.py in a subprocess against the fake Gemini REST server, then:
+  1. opens --connections Socket.IO clients and keeps them all connected,
+  2. fires --requests concurrent /analyze_sentiment calls that each wait
+     --gemini-latency-ms on Gemini,
+  3. meanwhile pings /metrics to check the worker keeps answering.
+
+With non-blocking upstream I/O the Gemini calls overlap, so phase 2 takes
+a few latencies instead of requests x latency, and the pings stay fast.
+Exits 1 if any of that doesn't hold.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import gevent
+import requests
+import socketio
+from gevent.pool import Pool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, HERE)
+
+from fakes import FakeGeminiServer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, gemini_base_url):
+    data_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        ASYNC_MODE='gevent', PORT=str(port), HOST='127.0.0.1',
+        GEMINI_API_KEY='smoke', GEMINI_API_BASE=gemini_base_url,
+        # Send every entry to Gemini, and let the guard and pool allow all of them at once
+        LOCAL_SENTIMENT_MIN_CONFIDENCE='2', GEMINI_CONCURRENCY_INITIAL='10000', GEMINI_CONCURRENCY_MAX='10000',
+        GEMINI_POOL_MAXSIZE='10000', GEMINI_QUEUE_TIMEOUT_SECONDS='30',
+        AI_ROUTE_RATE_PER_IP='1000000', AI_ROUTE_BURST_PER_IP='1000000',
+        PLAYLIST_PREWARM_MARKETS='', PLAYLIST_CACHE_PATH=os.path.join(data_dir, 'playlist_cache.db'),
+        JOURNAL_STORE_PATH=os.path.join(data_dir, 'journal.db'),
+        SENTIMENT_CACHE_MAX_ENTRIES='1'
+    )
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py'], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/metrics", timeout=1).ok:
+                return server, base_url
+        except requests.exceptions.RequestException:
+            gevent.sleep(0.2)
+    server.kill()
+    raise SystemExit("serve.py did not come up within 30s")
+
+
+def connect_clients(base_url, count, concurrency=200):
+    clients = []
+
+    def connect(_):
+        client = socketio.Client(reconnection=False)
+        try:
+            client.connect(base_url, transports=['polling'], wait_timeout=30)
+            clients.append(client)
+        except Exception as e:
+            print(f"connect failed: {e}")
+
+    Pool(concurrency).map(connect, range(count))
+    return clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--gemini-latency-ms', type=float, default=300)
+    args = parser.parse_args()
+    latency = args.gemini_latency_ms / 1000
+
+    gemini = FakeGeminiServer(latency=latency).start()
+    server, base_url = start_server(free_port(), gemini.base_url)
+    failures = []
+    try:
+        start = time.perf_counter()
+        clients = connect_clients(base_url, args.connections)
+        print(f"{len(clients)}/{args.connections} Socket.IO clients connected in {time.perf_counter() - start:.1f}s")
+        if len(clients) < args.connections:
+            failures.append('not every client could connect')
+
+        pings = []
+
+        def ping():
+            while True:
+                t = time.perf_counter()
+                requests.get(f"{base_url}/metrics", timeout=10)
+                pings.append(time.perf_counter() - t)
+                gevent.sleep(0.05)
+
+        def analyze(i):
+            try:
+                response = requests.post(f"{base_url}/analyze_sentiment", json={'text': f"journal entry {i}"}, timeout=60)
+            except requests.exceptions.RequestException as e:
+                print(f"analyze failed: {e}")
+                return False
+            return response.ok and response.json().get('source') == 'gemini'
+
+        pinger = gevent.spawn(ping)
+        start = time.perf_counter()
+        answered = sum(Pool(args.requests).map(analyze, range(args.requests)))
+        wall = time.perf_counter() - start
+        pinger.kill()
+
+        serial = args.requests * latency
+        print(f"{answered}/{args.requests} /analyze_sentiment answered by Gemini in {wall:.2f}s "
+              f"({serial:.0f}s if the calls ran one at a time)")
+        if pings:
+            pings.sort()
+            print(f"/metrics while loaded: {len(pings)} pings, max {pings[-1] * 1000:.0f} ms")
+        if answered < args.requests:
+            failures.append('some sentiment requests did not reach Gemini')
+        if wall > max(10 * latency, serial / 10):
+            failures.append('Gemini calls did not overlap')
+        if not pings or pings[-1] > 2.0:
+            failures.append('the worker stopped answering while Gemini calls were in flight')
+
+        still_connected = sum(1 for client in clients if client.connected)
+        print(f"{still_connected}/{len(clients)} clients still connected")
+        for client in clients:
+            client.disconnect()
+    finally:
+        server.terminate()
+        server.wait(10)
+        gemini.stop()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_import_time.py
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import app.
+
+Run from Mood-muffin-final/:  python benchmarks/bench_import_time.py [--runs 10]
+
+"eager" imports the Gemini SDK and spotipy before app, like app.py used
+to do at module level; "lazy" imports app alone, which defers both until
+first use. Each run is a new process, so nothing is cached between runs
+except the OS file cache (one warm-up run is discarded).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+VARIANTS = {
+    'eager': "import google.generativeai, spotipy; import app",
+    'lazy': "import app"
+}
+HEAVY = ('google.generativeai', 'spotipy')
+# Prefixes the module list, so whatever app prints at import doesn't get parsed as one
+MODULES_MARKER = 'heavy-modules:'
+
+
+def time_import(code):
+    env = dict(os.environ, GEMINI_API_KEY=os.getenv('GEMINI_API_KEY', 'bench'), PLAYLIST_PREWARM_MARKETS='')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def loaded_heavy_modules():
+    code = f"import sys, app; print({MODULES_MARKER!r} + ','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, GEMINI_API_KEY='bench', PLAYLIST_PREWARM_MARKETS='')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout.splitlines()
+    return next((line[len(MODULES_MARKER):] for line in out if line.startswith(MODULES_MARKER)), '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    medians = {}
+    for name, code in VARIANTS.items():
+        time_import(code)
+        samples = [time_import(code) for _ in range(args.runs)]
+        medians[name] = statistics.median(samples)
+        print(f"{name:<6} median {medians[name] * 1000:7.0f} ms   min {min(samples) * 1000:7.0f} ms   ({args.runs} runs)")
+    print(f"lazy saves {(medians['eager'] - medians['lazy']) * 1000:.0f} ms per worker start")
+    print(f"heavy SDKs loaded by 'import app': {loaded_heavy_modules() or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
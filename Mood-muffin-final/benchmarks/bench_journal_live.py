@@ -0,0 +1,96 @@
+# benchmarks/bench_journal_live.py
+"""
+Bytes sent and texts analyzed for one long journal entry typed live.
+
+Run from Mood-muffin-final/:  python benchmarks/bench_journal_live.py [--paragraphs 30]
+
+Simulates a writer typing --paragraphs paragraphs a few words at a time,
+with the client sending what changed every --words-per-send words and
+the server analyzing after every --sends-per-analysis sends. Compares:
+
+  whole text  every analysis POSTs the full entry, which is analyzed as one text
+  live        only deltas go over the socket, only changed paragraphs are analyzed
+
+"texts analyzed" counts texts given to the sentiment scorer, and
+"chars analyzed" their total length: what a Gemini call would be billed on
+if the local scorer deferred every one of them.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from journal_live import LiveJournal, ParagraphLabel
+from local_sentiment import classify_sentiment
+
+WORDS = ('today', 'I', 'felt', 'really', 'happy', 'anxious', 'about', 'work', 'and', 'my', 'friends',
+         'we', 'laughed', 'tired', 'hopeful', 'the', 'exam', 'tomorrow', 'calm', 'walk', 'park', 'sad')
+
+
+def paragraph_words(rng, count):
+    return [[rng.choice(WORDS) for _ in range(rng.randint(25, 60))] for _ in range(count)]
+
+
+def typing_steps(paragraphs, words_per_send):
+    """
+    Yields the full text after each send.
+    """
+    done = []
+    for words in paragraphs:
+        for end in range(words_per_send, len(words) + words_per_send, words_per_send):
+            yield '\n'.join(done + [' '.join(words[:end])])
+        done.append(' '.join(words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paragraphs', type=int, default=30)
+    parser.add_argument('--words-per-send', type=int, default=3)
+    parser.add_argument('--sends-per-analysis', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    steps = list(typing_steps(paragraph_words(rng, args.paragraphs), args.words_per_send))
+
+    whole = {'bytes': 0, 'texts': 0, 'chars': 0}
+    for i, text in enumerate(steps, 1):
+        if i % args.sends_per_analysis == 0 or i == len(steps):
+            whole['bytes'] += len(json.dumps({'text': text}))
+            whole['texts'] += 1
+            whole['chars'] += len(text)
+
+    live = {'bytes': 0, 'texts': 0, 'chars': 0}
+
+    def label_paragraphs(texts, client):
+        live['texts'] += len(texts)
+        live['chars'] += sum(len(t) for t in texts)
+        return [ParagraphLabel(*classify_sentiment(t), 'local') for t in texts]
+
+    journal = LiveJournal(label_paragraphs, debounce=0, max_delay=0)
+    sent = ''
+    for i, text in enumerate(steps, 1):
+        start = 0
+        while start < min(len(text), len(sent)) and text[start] == sent[start]:
+            start += 1
+        delta = {'version': i, 'start': start, 'end': len(sent), 'text': text[start:]}
+        live['bytes'] += len(json.dumps(delta))
+        journal.apply_delta('sid', 'user', delta)
+        sent = text
+        if i % args.sends_per_analysis == 0 or i == len(steps):
+            for sid in journal.due():
+                journal.analyze(sid)
+
+    print(f"{args.paragraphs} paragraphs, {len(steps[-1])} chars, {len(steps)} sends")
+    print(f"{'':<12} {'bytes sent':>12} {'texts analyzed':>15} {'chars analyzed':>15}")
+    for name, totals in (('whole text', whole), ('live', live)):
+        print(f"{name:<12} {totals['bytes']:12} {totals['texts']:15} {totals['chars']:15}")
+    print(f"live sends {whole['bytes'] / live['bytes']:.0f}x fewer bytes and analyzes "
+          f"{whole['chars'] / live['chars']:.0f}x fewer chars")
+
+
+if __name__ == '__main__':
+    main()
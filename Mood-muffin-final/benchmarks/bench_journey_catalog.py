@@ -0,0 +1,76 @@
+# benchmarks/bench_journey_catalog.py
+"""
+Micro-benchmark for the journey catalog lookups.
+
+Run from Mood-muffin-final/:  python benchmarks/bench_journey_catalog.py
+
+Compares the compiled catalog in music_therapy against the original
+functions, which rebuilt their nested journey dicts on every call.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import music_therapy
+
+LABELS = [f"{e}-{i}" for e in ('Sadness', 'Anger', 'Distress', 'Joy', 'Calm') for i in ('Low', 'Medium', 'High')]
+
+
+def legacy_get_stage_for_emotion(emotion_analysis):
+    emotion, intensity = emotion_analysis.split('-')
+    stage_index = 0
+    if intensity == 'Medium':
+        stage_index = 1
+    elif intensity == 'High':
+        stage_index = 2
+    journeys = {
+        'Sadness': ['Acknowledge & Validate', 'Process & Reflect', 'Empower & Uplift'],
+        'Anger': ['Match the Intensity', 'Channel & Process', 'Cool Down & Calm'],
+        'Distress': ['Safe Space', 'Gentle Reflection', 'Finding Hope'],
+        'Joy': ['Embrace the Joy', 'Amplify the Feeling', 'Sustained Happiness'],
+        'Default': ['Acknowledgment', 'Reflection', 'Empowerment']
+    }
+    stage_names = journeys.get(emotion, journeys['Default'])
+    if stage_index >= len(stage_names):
+        stage_index = len(stage_names) - 1
+    return stage_names[stage_index]
+
+
+def legacy_create_emotional_journey_plan(emotion_analysis):
+    emotion, _ = emotion_analysis.split('-')
+    uri = 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'
+    journeys = {
+        name: [{'label': label, 'playlist_uri': uri} for label in labels]
+        for name, labels in (
+            ('Sadness', ('Acknowledge & Validate', 'Process & Reflect', 'Empower & Uplift')),
+            ('Anger', ('Match the Intensity', 'Channel & Process', 'Cool Down & Calm')),
+            ('Distress', ('Safe Space', 'Gentle Reflection', 'Finding Hope')),
+            ('Joy', ('Embrace the Joy', 'Amplify the Feeling', 'Sustained Happiness')),
+            ('Default', ('Acknowledgment', 'Reflection', 'Empowerment'))
+        )
+    }
+    return journeys.get(emotion, journeys['Default'])
+
+
+def bench(fn, number=200000):
+    def run():
+        for label in LABELS:
+            fn(label)
+    seconds = min(timeit.repeat(run, number=number // len(LABELS), repeat=3))
+    return seconds * 1e9 / number
+
+
+def main():
+    rows = [
+        ('get_stage_for_emotion', legacy_get_stage_for_emotion, music_therapy.get_stage_for_emotion),
+        ('create_emotional_journey_plan', legacy_create_emotional_journey_plan, music_therapy.create_emotional_journey_plan)
+    ]
+    for name, legacy, compiled in rows:
+        before, after = bench(legacy), bench(compiled)
+        print(f"{name:<32} legacy {before:8.1f} ns/call   compiled {after:8.1f} ns/call   {before / after:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
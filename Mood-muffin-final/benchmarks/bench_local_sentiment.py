@@ -0,0 +1,47 @@
+# benchmarks/bench_local_sentiment.py
+"""
+Micro-benchmark for the on-box sentiment scorer.
+
+Run from Mood-muffin-final/:  python benchmarks/bench_local_sentiment.py
+
+Reports the per-entry latency of local_sentiment.classify_sentiment and
+how many entries it answers without going to Gemini.
+"""
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+from load_test import JOURNAL_SNIPPETS
+from local_sentiment import classify_sentiment, LOCAL_SENTIMENT_MIN_CONFIDENCE
+
+ENTRIES = JOURNAL_SNIPPETS + [
+    "I am so happy today, we laughed the whole evening and I feel really grateful.",
+    "Work was awful, I'm furious and frustrated that nobody helped.",
+    "I feel hopeless, like there's no way out of this.",
+    "Went to the store, cooked dinner, watched a show.",
+    "Really worried and stressed, the deadline keeps getting closer and I'm so nervous.",
+    "Not happy with how things are going, but not sad either."
+]
+
+
+def main(number=20000):
+    for text in ENTRIES:
+        label, confidence = classify_sentiment(text)
+        route = 'local' if confidence >= LOCAL_SENTIMENT_MIN_CONFIDENCE else 'gemini'
+        print(f"{label:<16} {confidence:5.2f}  -> {route:<6}  {text[:60]}")
+
+    def run():
+        for text in ENTRIES:
+            classify_sentiment(text)
+    seconds = min(timeit.repeat(run, number=number // len(ENTRIES), repeat=3))
+    local = sum(classify_sentiment(t).confidence >= LOCAL_SENTIMENT_MIN_CONFIDENCE for t in ENTRIES)
+    print(f"\n{seconds * 1e6 / number:.1f} us/entry, {local}/{len(ENTRIES)} answered locally "
+          f"(threshold {LOCAL_SENTIMENT_MIN_CONFIDENCE})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_matchmaking.py
+"""
+Simulated connect/disconnect churn against the chat matchmaking state.
+
+Run from Mood-muffin-final/:  python benchmarks/bench_matchmaking.py [--ops 100000] [--live 5000]
+
+Each op connects a new sid (start_chat) and, once `--live` users are online,
+disconnects a random existing one, so the steady state has about `--live`
+users split between the waiting set and rooms. The legacy list + pairs scan
+is run on the same trace for comparison (capped by --legacy-ops since its
+disconnect cost grows with the number of rooms).
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from matchmaking import Matchmaker
+
+
+class LegacyMatchmaker:
+    """
+    The original waiting_queue list + pairs dict logic from app.py.
+    """
+
+    def __init__(self):
+        self.waiting_queue = []
+        self.pairs = {}
+        self.lock = threading.Lock()
+
+    def enqueue(self, sid):
+        with self.lock:
+            self.waiting_queue.append(sid)
+            if len(self.waiting_queue) >= 2:
+                sid1 = self.waiting_queue.pop(0)
+                sid2 = self.waiting_queue.pop(0)
+                room_id = str(uuid.uuid4())
+                self.pairs[room_id] = [sid1, sid2]
+                return room_id, sid1, sid2
+
+    def disconnect(self, sid):
+        with self.lock:
+            if sid in self.waiting_queue:
+                self.waiting_queue.remove(sid)
+            for room_id, users in list(self.pairs.items()):
+                if sid in users:
+                    other_sid = [u for u in users if u != sid][0]
+                    del self.pairs[room_id]
+                    return room_id, other_sid
+
+
+def make_trace(ops, live, seed=7):
+    rng = random.Random(seed)
+    online = []
+    trace = []
+    for i in range(ops):
+        sid = f"sid-{i}"
+        trace.append(('connect', sid))
+        online.append(sid)
+        if len(online) > live:
+            # swap-remove a random user
+            j = rng.randrange(len(online))
+            online[j], online[-1] = online[-1], online[j]
+            trace.append(('disconnect', online.pop()))
+    return trace
+
+
+def run(engine, trace):
+    start = time.perf_counter()
+    for op, sid in trace:
+        if op == 'connect':
+            engine.enqueue(sid)
+        else:
+            engine.disconnect(sid)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=100000, help='simulated connects')
+    parser.add_argument('--live', type=int, default=5000, help='concurrent users kept online')
+    parser.add_argument('--legacy-ops', type=int, default=10000, help='connects to replay on the legacy engine')
+    args = parser.parse_args()
+
+    trace = make_trace(args.ops, args.live)
+    elapsed = run(Matchmaker(), trace)
+    print(f"Matchmaker: {len(trace)} ops ({args.ops} connects) in {elapsed:.3f}s, "
+          f"{elapsed * 1e6 / len(trace):.2f} us/op")
+
+    legacy_trace = make_trace(min(args.ops, args.legacy_ops), args.live)
+    elapsed = run(LegacyMatchmaker(), legacy_trace)
+    print(f"legacy list + scan: {len(legacy_trace)} ops in {elapsed:.3f}s, "
+          f"{elapsed * 1e6 / len(legacy_trace):.2f} us/op")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_static_pages.py
+"""
+Per-view cost of the static pages (dashboard, AI chat, whack-a-mole).
+
+Run from Mood-muffin-final/:  python benchmarks/bench_static_pages.py [--hits 2000]
+
+Times each page's view inside a request context, once as a plain
+render_template (how the pages used to be served) and once from the page
+cache, and shows the page size with and without gzip. Then counts the bytes
+a browser downloads for the dashboard and its assets on a first visit, and
+on a repeat visit, where fingerprinted assets come from the browser cache
+and the page is a 304.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GEMINI_API_KEY', 'bench')
+os.environ.setdefault('PLAYLIST_PREWARM_MARKETS', '')
+
+PAGES = {'/': ('dashboard.html', {'user': 'User'}), '/aichat': ('aichat.html', {}), '/whack-a-mole': ('mole.html', {})}
+
+
+def time_calls(fn, hits):
+    fn()
+    start = time.perf_counter()
+    for _ in range(hits):
+        fn()
+    return (time.perf_counter() - start) / hits
+
+
+def visit_bytes(client, accept_encoding, etag=None):
+    headers = {'Accept-Encoding': accept_encoding}
+    if etag:
+        headers['If-None-Match'] = etag
+    page = client.get('/', headers=headers)
+    total = len(page.data)
+    if page.status_code == 304:
+        return total, page.headers['ETag']
+    html = client.get('/').get_data(as_text=True)
+    for url in set(re.findall(r'/assets/[^"]+', html)):
+        total += len(client.get(url, headers=headers).data)
+    return total, page.headers['ETag']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hits', type=int, default=2000)
+    args = parser.parse_args()
+
+    import app as app_module
+    from flask import render_template
+    flask_app = app_module.app
+    client = flask_app.test_client()
+
+    print(f"{'page':<15} {'rendered us':>12} {'cached us':>10} {'bytes':>7} {'gzipped':>8}")
+    for path, (template, context) in PAGES.items():
+        with flask_app.test_request_context(path, headers={'Accept-Encoding': 'gzip'}):
+            rendered = time_calls(lambda: render_template(template, **context), args.hits)
+            cached = time_calls(lambda: app_module.cached_page(template, **context), args.hits)
+            size = len(render_template(template, **context).encode('utf-8'))
+            gzipped = len(app_module.cached_page(template, **context).get_data())
+        print(f"{path:<15} {rendered * 1e6:12.1f} {cached * 1e6:10.1f} {size:7} {gzipped:8}")
+
+    plain, _ = visit_bytes(client, 'identity')
+    compressed, etag = visit_bytes(client, 'gzip, br')
+    repeat, _ = visit_bytes(client, 'gzip, br', etag)
+    print(f"\ndashboard first visit: {plain} bytes uncompressed, {compressed} bytes compressed")
+    print(f"dashboard repeat visit: {repeat} bytes (304, assets served from the browser cache)")
+
+
+if __name__ == '__main__':
+    main()
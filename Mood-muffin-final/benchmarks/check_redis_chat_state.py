@@ -0,0 +1,149 @@
+# benchmarks/check_redis_chat_state.py
+"""
+Checks RedisChatState against an in-process Redis from fakeredis.
+
+Run from Mood-muffin-final/:  python benchmarks/check_redis_chat_state.py [--sids 400] [--threads 8]
+
+Needs `pip install fakeredis` (a dev-only dependency, the app itself only
+needs redis). First walks one pair through enqueue, partner, end and
+disconnect, then checks that a waiting sid whose worker died (its
+liveness key expired) is dropped instead of paired. Then two
+RedisChatState instances, standing in for two workers, share one
+fakeredis server and pair --sids sids from --threads threads at once:
+every sid must end up in exactly one room or be the one left waiting.
+Then both instances disconnect everyone and no chat keys may remain.
+Exits non-zero on the first broken expectation.
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chat_state import WAITING_KEY, RedisChatState, _room_key, _sid_key, _waiting_key
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def expect(condition, message):
+    if not condition:
+        print(f"FAILED: {message}")
+        sys.exit(1)
+
+
+def check_one_pair(state):
+    expect(state.enqueue('a') is None, "first sid should wait")
+    expect(state.enqueue('a') is None, "enqueueing a waiting sid again should be a no-op")
+    expect(state.redis.zcard(WAITING_KEY) == 1, "a waiting sid should be in the waiting set once")
+    room_id, waiting_sid, sid = state.enqueue('b')
+    expect((waiting_sid, sid) == ('a', 'b'), "second sid should be paired with the waiting one")
+    expect(state.enqueue('b') is None, "a sid already in a room should not be enqueued")
+    expect(state.partner(room_id, 'a') == 'b' and state.partner(room_id, 'b') == 'a', "partners should see each other")
+    expect(state.partner(room_id, 'c') is None, "a sid outside the room has no partner")
+    expect(state.end(room_id, 'a') == 'b', "ending the chat should return the other sid")
+    expect(state.end(room_id, 'a') is None, "ending a closed room should be a no-op")
+    expect(state.redis.get(_sid_key('b')) is None, "ending should clear both sids")
+
+    state.enqueue('c')
+    expect(state.disconnect('c') is None and state.redis.zcard(WAITING_KEY) == 0, "disconnect should cancel a wait")
+    state.enqueue('d')
+    room_id, _, _ = state.enqueue('e')
+    expect(state.disconnect('e') == (room_id, 'd'), "disconnect should end the room and return the partner")
+    expect(state.partner(room_id, 'd') is None, "the room should be gone after a disconnect")
+    expect(state.disconnect('e') is None, "a second disconnect should be a no-op")
+    print("enqueue, partner, end, disconnect: OK")
+
+
+def check_stale_waiting(server):
+    crashed = RedisChatState(fakeredis.FakeRedis(server=server, decode_responses=True))
+    alive = RedisChatState(fakeredis.FakeRedis(server=server, decode_responses=True))
+    crashed.enqueue('dead-sid')
+    expect(0 < alive.redis.ttl(_waiting_key('dead-sid')) <= 60, "a waiting sid should have a liveness TTL")
+    crashed.refresh_waiting()
+    expect(crashed.redis.ttl(_waiting_key('dead-sid')) > 0, "refresh_waiting should keep the sid alive")
+    # The crashed worker stops refreshing: same as the TTL running out
+    alive.redis.delete(_waiting_key('dead-sid'))
+    expect(alive.enqueue('live') is None, "a sid whose worker died should not be paired")
+    expect(alive.redis.zrange(WAITING_KEY, 0, -1) == ['live'], "the dead sid should be dropped from the waiting set")
+    room_id, waiting_sid, _ = alive.enqueue('live-2')
+    expect(waiting_sid == 'live', "live sids should still pair")
+    alive.refresh_waiting()
+    expect(not alive._waiting_here, "paired sids should stop being refreshed")
+    alive.disconnect('live')
+    print("stale waiting sid dropped instead of paired: OK")
+
+
+def check_concurrent_pairing(states, sids, threads):
+    rooms = []
+    rooms_lock = threading.Lock()
+
+    def connect(n):
+        state = states[n % len(states)]
+        for i in range(n, sids, threads):
+            paired = state.enqueue(f"sid-{i}")
+            if paired:
+                with rooms_lock:
+                    rooms.append(paired)
+
+    workers = [threading.Thread(target=connect, args=(n,)) for n in range(threads)]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+
+    paired = [sid for _, waiting_sid, sid in rooms for sid in (waiting_sid, sid)]
+    waiting = states[0].redis.zrange(WAITING_KEY, 0, -1)
+    expect(len(paired) == len(set(paired)), "a sid was paired into two rooms")
+    expect(len(waiting) == sids % 2, f"expected {sids % 2} sid left waiting, found {len(waiting)}")
+    expect(set(paired) | set(waiting) == {f"sid-{i}" for i in range(sids)}, "a sid was lost")
+    for room_id, waiting_sid, sid in rooms:
+        expect(states[1].partner(room_id, waiting_sid) == sid, "the other instance sees a different partner")
+        expect(states[0].redis.get(_sid_key(sid)) == room_id, "a sid key points at the wrong room")
+    print(f"{sids} sids from {threads} threads on {len(states)} instances: {len(rooms)} rooms, "
+          f"{len(waiting)} waiting: OK")
+
+    ended = []
+
+    def disconnect(n):
+        state = states[n % len(states)]
+        for i in range(n, sids, threads):
+            result = state.disconnect(f"sid-{i}")
+            if result:
+                with rooms_lock:
+                    ended.append(result[0])
+
+    workers = [threading.Thread(target=disconnect, args=(n,)) for n in range(threads)]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+
+    expect(sorted(ended) == sorted(room_id for room_id, _, _ in rooms), "each room should end exactly once")
+    leftover = [key for key in states[0].redis.scan_iter('chat:*') if key != 'chat:seq']
+    expect(not leftover, f"{len(leftover)} chat keys left after everyone disconnected, e.g. {leftover[:3]}")
+    expect(all(states[0].redis.get(_room_key(room_id)) is None for room_id in ended), "a room key survived")
+    print(f"concurrent disconnects: {len(ended)} rooms ended once each, no keys left: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sids', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    if fakeredis is None:
+        print("fakeredis is not installed: pip install fakeredis")
+        return 2
+
+    check_one_pair(RedisChatState(fakeredis.FakeRedis(decode_responses=True)))
+    check_stale_waiting(fakeredis.FakeServer())
+
+    server = fakeredis.FakeServer()
+    states = [RedisChatState(fakeredis.FakeRedis(server=server, decode_responses=True)) for _ in range(2)]
+    check_concurrent_pairing(states, args.sids, args.threads)
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# benchmarks/fakes.py
+"""
+Offline stand-ins for Gemini and Spotify with configurable latency and
+error rates, so the app can be benchmarked without network or quota.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+
+class FakeUpstreamError(Exception):
+    pass
+
+
+class Latency:
+    """
+    Sleeps for `latency` seconds (+/- `jitter`) and fails `error_rate` of the time.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in for google.generativeai.GenerativeModel.generate_content.
+
+    Messages containing any of `unsafe_words` come back with a high
+    dangerous-content rating and an 'unsafe' text answer.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, unsafe_words=('die', 'kill')):
+        self.timing = Latency(latency, jitter, error_rate)
+        self.unsafe_words = unsafe_words
+
+    @property
+    def calls(self):
+        return self.timing.calls
+
+    def generate_content(self, contents, **kwargs):
+        if self.timing.wait():
+            raise FakeUpstreamError("fake Gemini error")
+        unsafe = any(word in str(contents).lower() for word in self.unsafe_words)
+        # Same shape and enum values as the real types so app.py's checks work.
+        from google.generativeai.types import HarmCategory
+        rating = SimpleNamespace(
+            category=HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+            probability=0.9 if unsafe else 0.1
+        )
+        return SimpleNamespace(
+            candidates=[SimpleNamespace()],
+            prompt_feedback=SimpleNamespace(safety_ratings=[rating]),
+            text='unsafe' if unsafe else 'safe'
+        )
+
+
+class FakeGeminiServer:
+    """
+    Local HTTP server answering Gemini's generateContent REST endpoint.
+
+    `label` is returned as the model text, once per entry for batch
+    prompts. The first `fail_first` requests get a 429. Distinct client
+    connections are recorded in `connections`.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, label='Calm-Medium', fail_first=0):
+        fake = self
+        self.timing = Latency(latency, jitter, error_rate)
+        self.label = label
+        self.fail_first = fail_first
+        self.requests_seen = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with fake._lock:
+                    fake.connections.add(self.client_address)
+                    fake.requests_seen += 1
+                    throttled = fake.fail_first > 0
+                    fake.fail_first -= 1
+                failed = fake.timing.wait()
+                if throttled:
+                    self._reply(429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED'}}, retry_after='0')
+                elif failed:
+                    self._reply(503, {'error': {'code': 503, 'status': 'UNAVAILABLE'}})
+                else:
+                    try:
+                        answer = fake.answer(body)
+                    except (ValueError, KeyError, IndexError, TypeError):
+                        # Like Gemini, a body without a prompt is a 400 rather than a dropped connection
+                        self._reply(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}})
+                        return
+                    self._reply(200, {'candidates': [{'content': {'parts': [{'text': answer}]}}]})
+
+            def _reply(self, status, payload, retry_after=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header('Retry-After', retry_after)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    def answer(self, body):
+        """
+        One label for a single-entry prompt, "n: label" lines for a numbered batch prompt.
+        """
+        prompt = json.loads(body)['contents'][0]['parts'][0]['text']
+        entries = re.findall(r'^\s*\[(\d+)\] ', prompt, re.MULTILINE)
+        if not entries:
+            return self.label
+        return "\n".join(f"{n}: {self.label}" for n in entries)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeSpotify:
+    """
+    Covers the spotipy.Spotify methods the app calls.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, market='US', device_id='fake-device'):
+        self.timing = Latency(latency, jitter, error_rate)
+        self.market = market
+        self.device_id = device_id
+        self.call_counts = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.call_counts[name] = self.call_counts.get(name, 0) + 1
+        if self.timing.wait():
+            raise FakeUpstreamError(f"fake Spotify error in {name}")
+
+    def current_user(self):
+        self._call('current_user')
+        return {'id': 'fake-user', 'display_name': 'Fake User', 'country': self.market}
+
+    def search(self, q, type='playlist', limit=1, market=None, **kwargs):
+        self._call('search')
+        name = q.split(':', 1)[-1].strip('"')
+        return {'playlists': {'items': [{'name': name, 'uri': f"spotify:playlist:fake{abs(hash(name)) % 10 ** 8}"}]}}
+
+    def devices(self):
+        self._call('devices')
+        return {'devices': [{'id': self.device_id, 'is_active': True}]}
+
+    def transfer_playback(self, device_id, force_play=True):
+        self._call('transfer_playback')
+
+    def start_playback(self, device_id=None, context_uri=None, **kwargs):
+        self._call('start_playback')
@@ -0,0 +1,337 @@
+# benchmarks/load_test.py
+"""
+Load test for the Flask routes and Socket.IO events, fully offline.
+
+Run from Mood-muffin-final/:
+
+    python benchmarks/load_test.py --concurrency 16 --requests 2000
+    python benchmarks/load_test.py --gemini-latency-ms 300 --gemini-error-rate 0.05 --scenarios chat
+    python benchmarks/load_test.py --save-baseline main
+    python benchmarks/load_test.py --compare main --tolerance 0.25
+
+The app runs in-process (Flask test client + Flask-SocketIO test client).
+Gemini's SDK model, the Gemini REST endpoint and spotipy are replaced by
+the fakes in benchmarks/fakes.py. Baselines are JSON files under
+benchmarks/baselines/; --compare exits 1 if any p95 got slower or any
+throughput dropped by more than --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+from fakes import FakeGenerativeModel, FakeGeminiServer, FakeSpotify
+
+BASELINE_DIR = os.path.join(HERE, 'baselines')
+
+JOURNAL_SNIPPETS = [
+    "Today was a good day, I felt happy and calm after my walk.",
+    "I'm so angry at how the meeting went, nobody listened.",
+    "Feeling a bit anxious about the exam tomorrow.",
+    "I miss my friends and the evenings feel empty lately.",
+    "Honestly I feel hopeful, things are slowly getting better."
+]
+CHAT_MESSAGES = ["hey", "how are you?", "pretty good, you?", "lol same", "i want to die of boredom"]
+
+
+# -----------------------
+# App setup
+# -----------------------
+def load_app(args):
+    """
+    Starts the fake Gemini server, then imports app with every upstream faked.
+    """
+    gemini_server = FakeGeminiServer(
+        latency=args.gemini_latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        error_rate=args.gemini_error_rate
+    ).start()
+    os.environ.setdefault('GEMINI_API_KEY', 'bench')
+    os.environ['GEMINI_API_BASE'] = gemini_server.base_url
+    # Every simulated client shares one address, so the per-IP limits would only measure themselves
+    for name in ('CHAT_RATE_PER_SID', 'CHAT_BURST_PER_SID', 'CHAT_RATE_PER_IP', 'CHAT_BURST_PER_IP',
+                 'AI_ROUTE_RATE_PER_IP', 'AI_ROUTE_BURST_PER_IP'):
+        os.environ.setdefault(name, '1000000')
+    # Start every run with an empty playlist cache and journal so results are comparable
+    data_dir = tempfile.mkdtemp()
+    os.environ['PLAYLIST_CACHE_PATH'] = os.path.join(data_dir, 'playlist_cache.db')
+    os.environ['JOURNAL_STORE_PATH'] = os.path.join(data_dir, 'journal.db')
+
+    with contextlib.redirect_stderr(io.StringIO()):
+        import app as app_module
+        import gemini_client
+
+    fakes = {
+        'gemini_model': FakeGenerativeModel(
+            latency=args.gemini_latency_ms / 1000, jitter=args.jitter_ms / 1000,
+            error_rate=args.gemini_error_rate
+        ),
+        'gemini_rest': gemini_server,
+        'spotify': FakeSpotify(
+            latency=args.spotify_latency_ms / 1000, jitter=args.jitter_ms / 1000,
+            error_rate=args.spotify_error_rate
+        )
+    }
+    gemini_client.set_model(fakes['gemini_model'])
+    app_module.get_spotify_client = lambda: fakes['spotify']
+    return app_module, fakes
+
+
+def logged_in_client(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['spotify_token_info'] = {'access_token': 'fake', 'refresh_token': 'fake', 'expires_at': time.time() + 3600}
+        sess['spotify_user_key'] = f"bench-{id(client)}"
+    return client
+
+
+# -----------------------
+# Scenarios
+# -----------------------
+# Each scenario is a setup(app_module) -> op() factory. op() runs one unit of
+# work and yields (label, seconds, ok) samples.
+
+def http_scenario(method, path, body=None, login=False):
+    def setup(app_module):
+        client = logged_in_client(app_module) if login else app_module.app.test_client()
+
+        def op():
+            payload = body() if callable(body) else body
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=payload)
+            yield f"{method} {path}", time.perf_counter() - start, response.status_code < 400
+        return op
+    return setup
+
+
+def game_scenario(app_module):
+    client = app_module.app.test_client()
+    client.post('/start_game')
+
+    def op():
+        for method, path in (('POST', '/hit_mole'), ('GET', '/game_status')):
+            start = time.perf_counter()
+            response = client.open(path, method=method)
+            yield f"{method} {path}", time.perf_counter() - start, response.status_code < 400
+    return op
+
+
+def wait_for(client, event, timeout=10.0):
+    """
+    Polls a test client until `event` arrives. Returns its args or None.
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for received in client.get_received():
+            if received['name'] == event:
+                return received['args']
+        time.sleep(0.0005)
+    return None
+
+
+# Pairing is first come first served, so concurrent workers would pair each
+# other's clients. Workers take turns queueing so a is always paired with b.
+pairing_lock = threading.Lock()
+
+
+def chat_scenario(app_module, messages_per_chat=5):
+    sio, app = app_module.socketio, app_module.app
+
+    def op():
+        a, b = sio.test_client(app), sio.test_client(app)
+        try:
+            with pairing_lock:
+                start = time.perf_counter()
+                a.emit('start_chat')
+                b.emit('start_chat')
+                started = wait_for(a, 'chat_started')
+                ok = started is not None and wait_for(b, 'chat_started') is not None
+                elapsed = time.perf_counter() - start
+            yield 'socket start_chat', elapsed, ok
+            if not ok:
+                return
+            room_id = started[0]['room_id']
+            a.get_received(), b.get_received()
+
+            for _ in range(messages_per_chat):
+                start = time.perf_counter()
+                a.emit('send_message', {'room_id': room_id, 'message': random.choice(CHAT_MESSAGES)})
+                # Flagged messages only come back to the sender, so wait on a
+                ok = wait_for(a, 'message') is not None
+                yield 'socket send_message', time.perf_counter() - start, ok
+                b.get_received()
+
+            start = time.perf_counter()
+            a.emit('end_chat', {'room_id': room_id})
+            ok = wait_for(b, 'stranger_disconnected') is not None
+            yield 'socket end_chat', time.perf_counter() - start, ok
+        finally:
+            a.disconnect()
+            b.disconnect()
+    return op
+
+
+SCENARIOS = {
+    'analyze_sentiment': http_scenario('POST', '/analyze_sentiment', lambda: {'text': random.choice(JOURNAL_SNIPPETS)}),
+    'analyze_sentiment_batch': http_scenario(
+        'POST', '/analyze_sentiment_batch', lambda: {'texts': random.sample(JOURNAL_SNIPPETS * 4, 20)}
+    ),
+    'create_journey': http_scenario('POST', '/create_journey', {'sentiment': 'Sadness-Medium'}, login=True),
+    'play': http_scenario('POST', '/play', {'playlist_uri': 'spotify:playlist:fake', 'device_id': 'fake-device'}, login=True),
+    'game': game_scenario,
+    'chat': chat_scenario
+}
+
+
+# -----------------------
+# Runner + reporting
+# -----------------------
+def run_scenario(app_module, setup, concurrency, total_ops):
+    """
+    Runs `total_ops` ops spread over `concurrency` threads. Returns
+    ({label: [seconds]}, {label: errors}, wall_seconds).
+    """
+    remaining = [total_ops]
+    counter_lock = threading.Lock()
+    samples, errors = {}, {}
+    results_lock = threading.Lock()
+
+    def worker():
+        op = setup(app_module)
+        local_samples, local_errors = {}, {}
+        while True:
+            with counter_lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            try:
+                for label, seconds, ok in op():
+                    local_samples.setdefault(label, []).append(seconds)
+                    if not ok:
+                        local_errors[label] = local_errors.get(label, 0) + 1
+            except Exception:
+                local_errors['exceptions'] = local_errors.get('exceptions', 0) + 1
+        with results_lock:
+            for label, values in local_samples.items():
+                samples.setdefault(label, []).extend(values)
+            for label, count in local_errors.items():
+                errors[label] = errors.get(label, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, wall):
+    summary = {}
+    for label, values in samples.items():
+        values.sort()
+        summary[label] = {
+            'count': len(values),
+            'errors': errors.get(label, 0),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'throughput_per_s': round(len(values) / wall, 1) if wall else 0.0
+        }
+    if errors.get('exceptions'):
+        summary['exceptions'] = {'count': errors['exceptions']}
+    return summary
+
+
+def print_report(results):
+    print(f"{'label':<28}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for label, row in results.items():
+        if 'p50_ms' not in row:
+            print(f"{label:<28}{row['count']:>8}")
+            continue
+        print(f"{label:<28}{row['count']:>8}{row['errors']:>8}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['throughput_per_s']:>10.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints deltas against a baseline. Returns False if anything regressed.
+    """
+    ok = True
+    for label, row in results.items():
+        base = baseline.get(label)
+        if not base or 'p95_ms' not in row:
+            continue
+        p95_delta = (row['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0.0
+        tput_delta = (row['throughput_per_s'] - base['throughput_per_s']) / base['throughput_per_s'] if base['throughput_per_s'] else 0.0
+        regressed = p95_delta > tolerance or tput_delta < -tolerance
+        ok = ok and not regressed
+        print(f"{label:<28} p95 {p95_delta:+.1%}  throughput {tput_delta:+.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='ops per scenario (a chat op is a whole chat)')
+    parser.add_argument('--gemini-latency-ms', type=float, default=50)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--spotify-latency-ms', type=float, default=30)
+    parser.add_argument('--spotify-error-rate', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    # The app prints on every connect/disconnect, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        app_module, fakes = load_app(args)
+
+    results = {}
+    for name in args.scenarios.split(','):
+        setup = SCENARIOS[name.strip()]
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples, errors, wall = run_scenario(app_module, setup, args.concurrency, args.requests)
+        results.update(summarize(samples, errors, wall))
+
+    print_report(results)
+    print(f"upstream calls: gemini sdk={fakes['gemini_model'].calls} "
+          f"gemini rest={fakes['gemini_rest'].requests_seen} spotify={fakes['spotify'].call_counts}")
+    fakes['gemini_rest'].stop()
+
+    config = {k: v for k, v in vars(args).items() if k not in ('save_baseline', 'compare', 'tolerance')}
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+        print(f"baseline saved to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline['config'] != config:
+            print("warning: baseline was recorded with different settings")
+        if not compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/transport_reuse.py
+"""
+Checks the pooled Gemini transport against a local stub server.
+
+Run from Mood-muffin-final/:  python benchmarks/transport_reuse.py
+
+The stub answers generateContent like Gemini does, counts the TCP
+connections it sees and throws a 429 on the first request so the retry
+path is exercised. Exits non-zero if the pooled session didn't reuse its
+connections or the retry didn't recover.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fakes import FakeGeminiServer
+
+
+def main(calls=200, threads=8):
+    stub = FakeGeminiServer(label='Calm-Low', fail_first=1).start()
+    os.environ['GEMINI_API_KEY'] = 'stub'
+    os.environ['GEMINI_API_BASE'] = stub.base_url
+
+    import requests
+    import sentiment_analysis
+
+    # The public function caches by text, so call the uncached request directly
+    start = time.perf_counter()
+    workers = [
+        threading.Thread(target=lambda n: [sentiment_analysis._request_sentiment(f"entry {n} {i}", 'stub') for i in range(calls // threads)], args=(n,))
+        for n in range(threads)
+    ]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+    pooled_time = time.perf_counter() - start
+    pooled_conns = len(stub.connections)
+    pooled_requests = stub.requests_seen
+
+    stub.connections.clear()
+    start = time.perf_counter()
+    for i in range(calls // threads):
+        payload = {'contents': [{'parts': [{'text': f"entry bare {i}"}]}]}
+        response = requests.post(f"{stub.base_url}/v1beta/models/x:generateContent", json=payload)
+        response.raise_for_status()
+        response.close()
+    bare_time = time.perf_counter() - start
+    bare_conns = len(stub.connections)
+    stub.stop()
+
+    print(f"pooled session: {calls} calls on {threads} threads, {pooled_requests} requests, "
+          f"{pooled_conns} connections, {pooled_time:.2f}s total (includes one retry backoff)")
+    print(f"bare requests.post: {calls // threads} calls, {bare_conns} connections, "
+          f"{bare_time * 1000 / (calls // threads):.2f} ms/call")
+
+    ok = pooled_conns <= threads and pooled_requests == calls + 1
+    print('OK' if ok else 'FAILED: expected at most one connection per thread and one retried 429')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# chat_state.py
+import uuid
+
+from matchmaking import Matchmaker
+
+# Every backend has the Matchmaker interface:
+#   enqueue(sid) -> (room_id, waiting_sid, sid) | None
+#   cancel(sid) -> bool
+#   partner(room_id, sid) -> other_sid | None
+#   end(room_id, sid) -> other_sid | None
+#   disconnect(sid) -> (room_id, other_sid) | None
+
+WAITING_KEY = 'chat:waiting'
+SEQ_KEY = 'chat:seq'
+ROOM_TTL_SECONDS = 24 * 60 * 60
+# A waiting sid whose worker stops refreshing it is dropped after this long
+WAITING_TTL_SECONDS = 60
+
+
+class RedisChatState:
+    """
+    Matchmaking and room membership kept in a Redis-protocol server so any
+    number of Socket.IO workers can pair strangers and relay between them.
+
+    The waiting set is a sorted set scored by an INCR counter (FIFO order,
+    O(log n) cancel), and rooms are plain keys indexed both ways. Pairing and
+    teardown use WATCH/MULTI so two workers can never grab the same waiting
+    sid or close the same room twice. Room keys expire after a day so a
+    crashed worker can't leak state forever.
+
+    Every waiting sid also has a liveness key that expires after
+    WAITING_TTL_SECONDS. The worker holding the socket keeps it alive with
+    `refresh_waiting()`, and pairing skips and drops waiting sids whose key
+    is gone, so a crashed worker's sids are never handed to a real user.
+
+    `client` is a redis-py client created with decode_responses=True. Any
+    server speaking the protocol works (Redis, Valkey, KeyDB), and
+    `fakeredis.FakeRedis(decode_responses=True)` works as a local stand-in.
+    """
+
+    def __init__(self, client):
+        import redis
+        self._watch_error = redis.WatchError
+        self.redis = client
+        self._waiting_here = set()   # sids this instance queued, for refresh_waiting()
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def enqueue(self, sid):
+        seq = self.redis.incr(SEQ_KEY)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(WAITING_KEY, _sid_key(sid))
+                    if pipe.exists(_sid_key(sid)) or pipe.zscore(WAITING_KEY, sid) is not None:
+                        pipe.unwatch()
+                        return None
+                    head = pipe.zrange(WAITING_KEY, 0, 0)
+                    if head and not pipe.exists(_waiting_key(head[0])):
+                        # Its worker stopped refreshing it, nobody is on the other end
+                        pipe.multi()
+                        pipe.zrem(WAITING_KEY, head[0])
+                        pipe.execute()
+                        continue
+                    pipe.multi()
+                    if not head:
+                        pipe.zadd(WAITING_KEY, {sid: seq})
+                        pipe.set(_waiting_key(sid), 1, ex=WAITING_TTL_SECONDS)
+                        pipe.execute()
+                        self._waiting_here.add(sid)
+                        return None
+                    other_sid = head[0]
+                    room_id = str(uuid.uuid4())
+                    pipe.zrem(WAITING_KEY, other_sid)
+                    pipe.delete(_waiting_key(other_sid))
+                    pipe.set(_room_key(room_id), f"{other_sid} {sid}", ex=ROOM_TTL_SECONDS)
+                    pipe.set(_sid_key(other_sid), room_id, ex=ROOM_TTL_SECONDS)
+                    pipe.set(_sid_key(sid), room_id, ex=ROOM_TTL_SECONDS)
+                    pipe.execute()
+                    return room_id, other_sid, sid
+                except self._watch_error:
+                    # Someone else changed the queue first, look again.
+                    continue
+
+    def cancel(self, sid):
+        self._waiting_here.discard(sid)
+        with self.redis.pipeline() as pipe:
+            pipe.zrem(WAITING_KEY, sid)
+            pipe.delete(_waiting_key(sid))
+            removed, _ = pipe.execute()
+        return removed == 1
+
+    def refresh_waiting(self):
+        """
+        Keeps this instance's waiting sids from expiring. Call it more often
+        than every WAITING_TTL_SECONDS. Sids paired meanwhile are forgotten.
+        """
+        sids = list(self._waiting_here)
+        if not sids:
+            return
+        with self.redis.pipeline(transaction=False) as pipe:
+            for sid in sids:
+                # EXPIRE, not SET: a key deleted by pairing stays deleted
+                pipe.expire(_waiting_key(sid), WAITING_TTL_SECONDS)
+            alive = pipe.execute()
+        for sid, still_waiting in zip(sids, alive):
+            if not still_waiting:
+                self._waiting_here.discard(sid)
+
+    def partner(self, room_id, sid):
+        users = self.redis.get(_room_key(room_id))
+        return _other(users, sid)
+
+    def end(self, room_id, sid):
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(_room_key(room_id))
+                    other_sid = _other(pipe.get(_room_key(room_id)), sid)
+                    if other_sid is None:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.delete(_room_key(room_id), _sid_key(sid), _sid_key(other_sid))
+                    pipe.execute()
+                    return other_sid
+                except self._watch_error:
+                    continue
+
+    def disconnect(self, sid):
+        if self.cancel(sid):
+            return None
+        room_id = self.redis.get(_sid_key(sid))
+        if room_id is None:
+            return None
+        other_sid = self.end(room_id, sid)
+        return (room_id, other_sid) if other_sid else None
+
+
+def create_chat_state(backend, redis_url=None):
+    """
+    Builds the chat state backend named by CHAT_STATE_BACKEND ('memory' or 'redis').
+    """
+    if backend == 'memory':
+        return Matchmaker()
+    if backend == 'redis':
+        return RedisChatState.from_url(redis_url)
+    raise ValueError(f"Unknown chat state backend: {backend!r}")
+
+
+def _room_key(room_id):
+    return f"chat:room:{room_id}"
+
+
+def _sid_key(sid):
+    return f"chat:sid:{sid}"
+
+
+def _waiting_key(sid):
+    return f"chat:waiting:{sid}"
+
+
+def _other(users, sid):
+    if not users:
+        return None
+    sid1, sid2 = users.split(' ')
+    if sid == sid1:
+        return sid2
+    if sid == sid2:
+        return sid1
+    return None
@@ -0,0 +1,132 @@
+# game_sessions.py
+import threading
+import time
+
+
+class GameRecord:
+    """
+    One player's whack-a-mole game. Slots keep the per-game cost small when
+    lots of games are live at once.
+    """
+    __slots__ = ('score', 'start_time', 'duration', 'game_over', 'sid', 'last_seen')
+
+    def __init__(self, duration, now):
+        self.score = 0
+        self.start_time = now
+        self.duration = duration
+        self.game_over = False
+        self.sid = None
+        self.last_seen = now
+
+    def time_left(self, now):
+        return max(0, self.duration - (now - self.start_time))
+
+    def to_dict(self, now):
+        return {
+            'score': self.score,
+            'time_left': round(self.time_left(now)),
+            # Time can run out between ticks, before tick() marks the game over
+            'game_over': self.game_over or self.time_left(now) <= 0
+        }
+
+
+class GameStore:
+    """
+    Games keyed by the player's game id, with a sweeper for abandoned ones.
+
+    A finished game is kept for `keep_finished` seconds so the final score
+    can still be read, and any game nobody has touched for `idle_timeout`
+    seconds is dropped.
+    """
+
+    def __init__(self, duration=30, keep_finished=300, idle_timeout=600):
+        self.duration = duration
+        self.keep_finished = keep_finished
+        self.idle_timeout = idle_timeout
+        self._games = {}
+        self._sid_game = {}    # sid -> game_id, for O(1) detach on disconnect
+        self._lock = threading.Lock()
+
+    def start(self, game_id):
+        now = time.time()
+        game = GameRecord(self.duration, now)
+        with self._lock:
+            old = self._games.get(game_id)
+            if old is not None:
+                game.sid = old.sid
+            self._games[game_id] = game
+        return game
+
+    def get(self, game_id):
+        return self._games.get(game_id)
+
+    def hit(self, game_id):
+        """
+        Scores a hit if the game still has time left. Returns (game, scored),
+        or (None, False) if there is no such game. Only tick() ends games, so
+        the end is always pushed to the player.
+        """
+        game = self._games.get(game_id)
+        if game is None:
+            return None, False
+        now = time.time()
+        with self._lock:
+            game.last_seen = now
+            scored = not game.game_over and game.time_left(now) > 0
+            if scored:
+                game.score += 1
+        return game, scored
+
+    def attach(self, game_id, sid):
+        with self._lock:
+            game = self._games.get(game_id)
+            if game is not None:
+                game.sid = sid
+                game.last_seen = time.time()
+                self._sid_game[sid] = game_id
+        return game
+
+    def detach(self, sid):
+        with self._lock:
+            game = self._games.get(self._sid_game.pop(sid, None))
+            if game is not None and game.sid == sid:
+                game.sid = None
+
+    def tick(self, now=None):
+        """
+        Finishes games whose time ran out. Returns (running, finished) lists of
+        (sid, game) for games that have a socket attached.
+        """
+        now = now or time.time()
+        running, finished = [], []
+        with self._lock:
+            for game in self._games.values():
+                if game.game_over:
+                    continue
+                if game.time_left(now) <= 0:
+                    game.game_over = True
+                    if game.sid:
+                        finished.append((game.sid, game))
+                elif game.sid:
+                    running.append((game.sid, game))
+        return running, finished
+
+    def sweep(self, now=None):
+        """
+        Drops finished and abandoned games. Returns how many were removed.
+        """
+        now = now or time.time()
+        with self._lock:
+            expired = [
+                game_id for game_id, game in self._games.items()
+                if now - game.last_seen > self.idle_timeout
+                or now - (game.start_time + game.duration) > self.keep_finished
+            ]
+            for game_id in expired:
+                game = self._games.pop(game_id)
+                if game.sid is not None:
+                    self._sid_game.pop(game.sid, None)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._games)
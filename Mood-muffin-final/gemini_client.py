@@ -0,0 +1,54 @@
+# gemini_client.py
+import os
+import threading
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+# The SDK's default gRPC transport blocks the gevent hub, its REST transport goes through patched sockets
+GEMINI_SDK_TRANSPORT = os.getenv("GEMINI_SDK_TRANSPORT") or ("rest" if os.getenv("ASYNC_MODE") == "gevent" else None)
+
+_model = None
+_model_lock = threading.Lock()
+
+
+class GeminiNotConfigured(Exception):
+    pass
+
+
+def get_model():
+    """
+    Returns the shared GenerativeModel, importing and configuring the SDK
+    on first use. The SDK takes about a second to import, so processes that
+    never talk to Gemini don't pay for it. Concurrent first calls wait for
+    a single initialization.
+    """
+    global _model
+    model = _model
+    if model is None:
+        with _model_lock:
+            if _model is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise GeminiNotConfigured("GEMINI_API_KEY environment variable not set")
+                from google.generativeai import configure, GenerativeModel
+                configure(api_key=api_key, transport=GEMINI_SDK_TRANSPORT)
+                _model = GenerativeModel(GEMINI_MODEL_NAME)
+            model = _model
+    return model
+
+
+def set_model(model):
+    """
+    Replaces the shared model, e.g. with a fake in benchmarks.
+    """
+    global _model
+    with _model_lock:
+        _model = model
+
+
+class LazyModel:
+    """
+    Stands in for the GenerativeModel until something is called on it.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_model(), name)
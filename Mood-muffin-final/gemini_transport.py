@@ -0,0 +1,63 @@
+# gemini_transport.py
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# -----------------------
+# Transport settings
+# -----------------------
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "3.05"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "15"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_BACKOFF_FACTOR = float(os.getenv("GEMINI_BACKOFF_FACTOR", "0.5"))
+GEMINI_BACKOFF_JITTER = float(os.getenv("GEMINI_BACKOFF_JITTER", "0.5"))
+GEMINI_POOL_CONNECTIONS = int(os.getenv("GEMINI_POOL_CONNECTIONS", "4"))
+GEMINI_POOL_MAXSIZE = int(os.getenv("GEMINI_POOL_MAXSIZE", "32"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def build_session(max_retries=GEMINI_MAX_RETRIES, pool_connections=GEMINI_POOL_CONNECTIONS,
+                  pool_maxsize=GEMINI_POOL_MAXSIZE):
+    """
+    Creates a keep-alive session with bounded, jittered retries on 429/5xx.
+    Retries are allowed for POST too since generateContent has no side effects.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        backoff_factor=GEMINI_BACKOFF_FACTOR,
+        backoff_jitter=GEMINI_BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        # Hand the last 429/5xx back to the caller instead of raising RetryError
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+        # Extra threads wait for a free connection instead of opening throwaway ones
+        pool_block=True
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+# Shared by every thread in the process. urllib3 pools are thread-safe and
+# nothing here touches session state (cookies, auth) after construction.
+session = build_session()
+
+
+def post_json(url, data, timeout=None):
+    """
+    POSTs an already-encoded JSON body over the shared session.
+    """
+    return session.post(url, data=data, timeout=timeout or (GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT))
@@ -0,0 +1,200 @@
+# journal_live.py
+import os
+import threading
+import time
+from collections import namedtuple
+
+from journal_store import INTENSITY_SCORES
+
+# Analyze once the writer pauses this long, but never wait longer than the max delay
+JOURNAL_LIVE_DEBOUNCE_SECONDS = float(os.getenv("JOURNAL_LIVE_DEBOUNCE_SECONDS", "2"))
+JOURNAL_LIVE_MAX_DELAY_SECONDS = float(os.getenv("JOURNAL_LIVE_MAX_DELAY_SECONDS", "10"))
+JOURNAL_LIVE_MAX_CHARS = int(os.getenv("JOURNAL_LIVE_MAX_CHARS", "50000"))
+
+# source is 'local', 'gemini', or 'fallback' when Gemini failed or was rate limited and the local guess stands in
+ParagraphLabel = namedtuple('ParagraphLabel', ['label', 'confidence', 'source'])
+
+
+class DeltaRejected(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def split_paragraphs(text):
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+def combine_labels(labelled):
+    """
+    One label for the whole document from its (paragraph, ParagraphLabel)
+    pairs: any Distress paragraph wins outright, otherwise the label with
+    the most length x confidence behind it. Returns (label, share of the weight).
+    """
+    distress = [label.label for _, label in labelled if label.label.startswith('Distress-')]
+    if distress:
+        return max(distress, key=lambda l: INTENSITY_SCORES.get(l.partition('-')[2], 0)), 1.0
+    weights = {}
+    for paragraph, label in labelled:
+        confidence = 1.0 if label.confidence is None else max(label.confidence, 0.05)
+        weights[label.label] = weights.get(label.label, 0) + len(paragraph) * confidence
+    best = max(weights, key=weights.get)
+    return best, weights[best] / sum(weights.values())
+
+
+class JournalDocument:
+    """
+    The text one socket is editing, plus the labels of its paragraphs.
+    Labels are keyed by paragraph text, so an edit only invalidates the
+    paragraphs it touched.
+    """
+    __slots__ = ('text', 'version', 'user_id', 'client', 'entry_id', 'labels', 'label', 'dirty_since', 'changed_at',
+                 'analyzing')
+
+    def __init__(self, user_id, client=None):
+        self.text = ''
+        self.version = 0
+        self.user_id = user_id
+        self.client = client      # who is charged for the model calls, e.g. an IP
+        self.entry_id = None      # the client's id for the entry, the same across reconnects
+        self.labels = {}          # paragraph -> ParagraphLabel
+        self.label = None         # last combined label pushed to the client
+        self.dirty_since = None   # first change not analyzed yet
+        self.changed_at = None
+        self.analyzing = False
+
+
+class LiveJournal:
+    """
+    Journal documents keyed by Socket.IO sid, kept in sync by small text
+    deltas instead of the whole entry.
+
+    A delta replaces characters [start, end) of the document with `text`
+    (offsets count code points) and carries the document's next version.
+    A gap in versions, e.g. after a reconnect, raises DeltaRejected so the
+    client sends the full text again with `reset`, along with its
+    `entry_id` for the entry, so the entry can be stored under it.
+
+    `due()` returns the documents whose writer has paused for `debounce`
+    seconds (or kept typing for `max_delay`). `analyze()` labels only the
+    paragraphs it has no label for yet, through
+    `label_paragraphs(texts, client)`, which returns one ParagraphLabel per
+    text and is expected to rate limit by `client`.
+    """
+
+    def __init__(self, label_paragraphs, debounce=JOURNAL_LIVE_DEBOUNCE_SECONDS,
+                 max_delay=JOURNAL_LIVE_MAX_DELAY_SECONDS, max_chars=JOURNAL_LIVE_MAX_CHARS):
+        self.label_paragraphs = label_paragraphs
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_chars = max_chars
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def apply_delta(self, sid, user_id, delta, client=None, now=None):
+        """
+        Applies one delta to the sid's document. Returns the new version.
+        """
+        now = now or time.time()
+        try:
+            version = int(delta['version'])
+            text = delta.get('text', '')
+            if not isinstance(text, str):
+                raise TypeError('text must be a string')
+            if not delta.get('reset'):
+                start, end = int(delta['start']), int(delta['end'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise DeltaRejected('invalid', f"Malformed journal delta: {e}")
+
+        with self._lock:
+            doc = self._docs.get(sid)
+            if doc is None:
+                doc = self._docs[sid] = JournalDocument(user_id, client)
+            if delta.get('reset'):
+                new_text = text
+                if isinstance(delta.get('entry_id'), str):
+                    doc.entry_id = delta['entry_id']
+            else:
+                if version != doc.version + 1:
+                    raise DeltaRejected('version', f"Expected version {doc.version + 1}, got {version}")
+                if not 0 <= start <= end <= len(doc.text):
+                    raise DeltaRejected('invalid', f"Delta range {start}-{end} is outside the document")
+                new_text = doc.text[:start] + text + doc.text[end:]
+            if len(new_text) > self.max_chars:
+                raise DeltaRejected('too_long', f"Journal entries are limited to {self.max_chars} characters")
+            doc.version = version
+            if new_text != doc.text:
+                doc.text = new_text
+                doc.changed_at = now
+                if doc.dirty_since is None:
+                    doc.dirty_since = now
+            return version
+
+    def due(self, now=None):
+        """
+        Returns the sids ready for analysis and marks them as being analyzed.
+        """
+        now = now or time.time()
+        ready = []
+        with self._lock:
+            for sid, doc in self._docs.items():
+                if doc.dirty_since is None or doc.analyzing:
+                    continue
+                if now - doc.changed_at >= self.debounce or now - doc.dirty_since >= self.max_delay:
+                    doc.analyzing = True
+                    ready.append(sid)
+        return ready
+
+    def analyze(self, sid):
+        """
+        Labels the document's new paragraphs and returns
+        {'version', 'sentiment', 'confidence', 'paragraphs', 'analyzed'},
+        or None if the document is gone or empty.
+        """
+        with self._lock:
+            doc = self._docs.get(sid)
+            if doc is None:
+                return None
+            text, version, client = doc.text, doc.version, doc.client
+            doc.dirty_since = None
+            known = dict(doc.labels)
+
+        try:
+            paragraphs = split_paragraphs(text)
+            new = list(dict.fromkeys(p for p in paragraphs if p not in known))
+            if new:
+                known.update(zip(new, self.label_paragraphs(new, client)))
+        finally:
+            with self._lock:
+                doc.analyzing = False
+        if not paragraphs:
+            return None
+
+        label, confidence = combine_labels([(p, known[p]) for p in paragraphs])
+        with self._lock:
+            # Stand-in labels are not kept, so those paragraphs get another try after the next edit
+            doc.labels = {p: known[p] for p in paragraphs if known[p].source != 'fallback'}
+            doc.label = label
+        return {
+            'version': version, 'sentiment': label, 'confidence': round(confidence, 2),
+            'paragraphs': len(paragraphs), 'analyzed': len(new)
+        }
+
+    def finish(self, sid):
+        """
+        Analyzes the sid's document one last time, so the label matches its
+        final text, then forgets it. Returns (document, analysis), either
+        of which can be None.
+        """
+        result = self.analyze(sid)
+        return self.close(sid), result
+
+    def close(self, sid):
+        """
+        Forgets the sid's document and returns it, or None.
+        """
+        with self._lock:
+            return self._docs.pop(sid, None)
+
+    def __len__(self):
+        return len(self._docs)
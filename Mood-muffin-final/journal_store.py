@@ -0,0 +1,219 @@
+# journal_store.py
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+JOURNAL_STORE_PATH = os.getenv("JOURNAL_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal.db"))
+JOURNAL_EXPORT_PAGE_SIZE = int(os.getenv("JOURNAL_EXPORT_PAGE_SIZE", "500"))
+# Most appends the writer commits in one transaction
+JOURNAL_WRITE_BATCH = int(os.getenv("JOURNAL_WRITE_BATCH", "256"))
+
+INTENSITY_SCORES = {'Low': 1, 'Medium': 2, 'High': 3}
+PERIODS = ('day', 'week')
+
+
+def period_starts(created_at):
+    """
+    The UTC day and the Monday of its week that an entry made at `created_at` rolls up into.
+    """
+    day = datetime.fromtimestamp(created_at, tz=timezone.utc).date()
+    return {'day': day.isoformat(), 'week': (day - timedelta(days=day.weekday())).isoformat()}
+
+
+class JournalStore:
+    """
+    Append-only store for journal entries and their "Emotion-Intensity" labels.
+
+    Every append also bumps the user's daily and weekly rollup rows in the
+    same transaction, so timeline queries only read the small rollup table
+    and never rescan entries. Periods are UTC days and Monday-based weeks.
+
+    An append with an `entry_id` the user already stored is a new revision
+    of that entry: the old row is marked superseded and its rollup counts
+    are taken back, so an entry saved again as it grows still counts once,
+    under the day it was started. Rows are never deleted.
+
+    Appends are queued and committed by a single writer thread, up to
+    `batch` at a time, so request threads never wait on each other for the
+    database. A user's reads wait only for that user's own queued appends.
+    """
+
+    def __init__(self, path=JOURNAL_STORE_PATH, batch=JOURNAL_WRITE_BATCH):
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = None
+        self._progress = threading.Condition()
+        self._queued = 0        # sequence number of the last queued append
+        self._written = 0       # ... and of the last one the writer is done with
+        self._user_queued = {}  # user_id -> sequence number of their last append still queued
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, created_at REAL NOT NULL,"
+            " text TEXT NOT NULL, sentiment TEXT NOT NULL, emotion TEXT NOT NULL, intensity TEXT NOT NULL,"
+            " source TEXT, entry_id TEXT, superseded INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS entries_by_user ON entries (user_id, id);"
+            "CREATE TABLE IF NOT EXISTS mood_rollups ("
+            " user_id TEXT NOT NULL, period TEXT NOT NULL, period_start TEXT NOT NULL, emotion TEXT NOT NULL,"
+            " entries INTEGER NOT NULL, intensity_sum INTEGER NOT NULL,"
+            " PRIMARY KEY (user_id, period, period_start, emotion));"
+        )
+        # Databases made before entry revisions
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if 'entry_id' not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN entry_id TEXT")
+            self._db.execute("ALTER TABLE entries ADD COLUMN superseded INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_by_entry_id ON entries (user_id, entry_id) WHERE entry_id IS NOT NULL"
+        )
+
+    def append(self, user_id, text, sentiment, source=None, created_at=None, entry_id=None):
+        """
+        Queues one analyzed entry for the writer and returns straight away.
+        """
+        if self._writer is None:
+            self._start_writer()
+        with self._progress:
+            # Queued under the condition, so the queue is in sequence order
+            self._queued += 1
+            self._user_queued[user_id] = self._queued
+            self._pending.put((self._queued, user_id, created_at or time.time(), text, sentiment, source, entry_id))
+
+    def flush(self, user_id=None):
+        """
+        Blocks until the user's queued entries, or everyone's, have been committed.
+        """
+        with self._progress:
+            target = self._queued if user_id is None else self._user_queued.get(user_id, 0)
+            self._progress.wait_for(lambda: self._written >= target)
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='journal-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            entries = [self._pending.get()]
+            while len(entries) < self.batch:
+                try:
+                    entries.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(entries)
+            except Exception as e:
+                print(f"Error storing {len(entries)} journal entries: {e}")
+            finally:
+                with self._progress:
+                    self._written = entries[-1][0]
+                    for seq, user_id, *_ in entries:
+                        if self._user_queued.get(user_id) == seq:
+                            del self._user_queued[user_id]
+                    self._progress.notify_all()
+
+    def _write(self, entries):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for _, user_id, created_at, text, sentiment, source, entry_id in entries:
+                    if entry_id is not None:
+                        previous = self._db.execute(
+                            "SELECT id, created_at, text, sentiment, emotion, intensity FROM entries"
+                            " WHERE user_id = ? AND entry_id = ? AND superseded = 0",
+                            (user_id, entry_id)
+                        ).fetchone()
+                        if previous is not None:
+                            row_id, created_at, old_text, old_sentiment, old_emotion, old_intensity = previous
+                            if (old_text, old_sentiment) == (text, sentiment):
+                                continue
+                            self._db.execute("UPDATE entries SET superseded = 1 WHERE id = ?", (row_id,))
+                            self._roll_up(user_id, created_at, old_emotion, old_intensity, -1)
+                    emotion, _, intensity = sentiment.partition('-')
+                    self._db.execute(
+                        "INSERT INTO entries (user_id, created_at, text, sentiment, emotion, intensity, source, entry_id)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, created_at, text, sentiment, emotion, intensity, source, entry_id)
+                    )
+                    self._roll_up(user_id, created_at, emotion, intensity, 1)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _roll_up(self, user_id, created_at, emotion, intensity, sign):
+        """
+        Adds (sign 1) or takes back (sign -1) one entry in its day and week rollups.
+        """
+        score = INTENSITY_SCORES.get(intensity, INTENSITY_SCORES['Medium'])
+        starts = period_starts(created_at)
+        self._db.executemany(
+            "INSERT INTO mood_rollups (user_id, period, period_start, emotion, entries, intensity_sum)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (user_id, period, period_start, emotion) DO UPDATE SET"
+            " entries = entries + excluded.entries, intensity_sum = intensity_sum + excluded.intensity_sum",
+            [(user_id, period, starts[period], emotion, sign, sign * score) for period in PERIODS]
+        )
+        if sign < 0:
+            self._db.execute(
+                "DELETE FROM mood_rollups WHERE user_id = ? AND emotion = ? AND entries <= 0", (user_id, emotion)
+            )
+
+    def timeline(self, user_id, period='day', since=None):
+        """
+        Returns the user's mood per period, oldest first:
+        [{'period_start', 'entries', 'dominant', 'emotions': {emotion: {'entries', 'avg_intensity'}}}]
+        `since` is an ISO date; only periods starting on or after it are returned.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {PERIODS}, got {period!r}")
+        self.flush(user_id)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT period_start, emotion, entries, intensity_sum FROM mood_rollups"
+                " WHERE user_id = ? AND period = ? AND period_start >= ? ORDER BY period_start, emotion",
+                (user_id, period, since or '')
+            ).fetchall()
+
+        timeline = []
+        for period_start, emotion, entries, intensity_sum in rows:
+            if not timeline or timeline[-1]['period_start'] != period_start:
+                timeline.append({'period_start': period_start, 'entries': 0, 'dominant': None, 'emotions': {}})
+            point = timeline[-1]
+            point['entries'] += entries
+            point['emotions'][emotion] = {'entries': entries, 'avg_intensity': round(intensity_sum / entries, 2)}
+        for point in timeline:
+            point['dominant'] = max(point['emotions'], key=lambda e: point['emotions'][e]['entries'])
+        return timeline
+
+    def export(self, user_id, page_size=JOURNAL_EXPORT_PAGE_SIZE):
+        """
+        Yields the user's entries as NDJSON lines, oldest first. Reads one
+        page at a time, so a long history never sits in memory or holds the lock.
+        Only the latest revision of each entry is exported.
+        """
+        self.flush(user_id)
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, created_at, text, sentiment, source FROM entries"
+                    " WHERE user_id = ? AND id > ? AND superseded = 0 ORDER BY id LIMIT ?",
+                    (user_id, last_id, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, created_at, text, sentiment, source in rows:
+                yield json.dumps({
+                    'id': row_id, 'created_at': created_at, 'text': text,
+                    'sentiment': sentiment, 'source': source
+                }) + '\n'
+            last_id = rows[-1][0]
@@ -0,0 +1,152 @@
+# keyword_matcher.py
+import json
+import os
+import re
+import unicodedata
+
+MODERATION_PHRASES_PATH = os.getenv("MODERATION_PHRASES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "moderation_phrases.json"))
+
+# Look-alike letters from other scripts and common leetspeak, folded to plain a-z
+_CONFUSABLES = {
+    'а': 'a', 'е': 'e', 'о': 'o', 'р': 'p', 'с': 'c', 'х': 'x', 'у': 'y', 'і': 'i', 'ј': 'j', 'ѕ': 's',
+    'к': 'k', 'м': 'm', 'т': 't', 'в': 'b', 'н': 'h', 'ӏ': 'l',
+    'α': 'a', 'ε': 'e', 'ο': 'o', 'ρ': 'p', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'τ': 't', 'υ': 'u', 'χ': 'x',
+    '0': 'o', '1': 'i', '2': 'to', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+    '@': 'a', '$': 's', '|': 'l', '¥': 'y', '€': 'e',
+}
+_FOLD = str.maketrans(_CONFUSABLES)
+_NOT_LETTER = re.compile(r"[^a-z]+")
+
+# ASCII fast path: one bytes.translate folds leetspeak to letters ('2' -> 'to' is done first),
+# and can drop everything that isn't a letter in the same pass
+_ASCII_FOLD = bytes(
+    ord(_CONFUSABLES.get(chr(b), chr(b))) if len(_CONFUSABLES.get(chr(b), chr(b))) == 1 else b
+    for b in range(256)
+)
+_ASCII_NOT_LETTER = bytes(b for b in range(256) if not 97 <= _ASCII_FOLD[b] <= 122)
+
+
+def normalize_for_matching(text):
+    """
+    Reduces text to bare a-z so spacing, punctuation, accents, look-alike
+    letters and leetspeak don't hide a phrase: "K i l l-m¥ $elf", "kіll
+    myself" (Cyrillic i) and "k1ll mys3lf" all become "killmyself", and
+    "i w@nt 2 d1e" becomes "iwanttodie".
+    """
+    text = unicodedata.normalize('NFKD', text.casefold()).translate(_FOLD)
+    return _NOT_LETTER.sub('', text)
+
+
+def _letters(text):
+    """
+    normalize_for_matching(text) as ASCII bytes, taking the C-speed path for ASCII text.
+    """
+    text = text.casefold()
+    if text.isascii():
+        return text.replace('2', 'to').encode('ascii').translate(_ASCII_FOLD, _ASCII_NOT_LETTER)
+    return normalize_for_matching(text).encode('ascii')
+
+
+def _words(text):
+    """
+    The same letters, but with the words kept apart by single spaces, so
+    matches can be held to word boundaries.
+    """
+    text = text.casefold()
+    if text.isascii():
+        text = text.replace('2', 'to').encode('ascii').translate(_ASCII_FOLD).decode('ascii')
+    else:
+        # Drop accents first, so "café" stays one word
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch)).translate(_FOLD)
+    return _NOT_LETTER.sub(' ', text)
+
+
+def _trie_pattern(keys, spaced):
+    """
+    One regex for all `keys`, nested by shared prefix so the engine tries
+    at most one branch per letter and can skip ahead to the letters a key
+    starts with.
+
+    `spaced` lets a space sit between any two letters and makes every key
+    start a word. That check sits after the first letter, so the skipping
+    ahead still works.
+    """
+    trie = {}
+    for key in keys:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node, first):
+        branches = []
+        for ch, child in sorted(node.items()):
+            if ch == '':
+                branches.append('')
+            elif not spaced:
+                branches.append(ch + build(child, False))
+            else:
+                branches.append((ch + '(?<![a-z].)' if first else ' ?' + ch) + build(child, False))
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return build(trie, True)
+
+
+class KeywordMatcher:
+    """
+    Normalized phrases compiled into regular expressions, so every scan
+    runs at C speed whatever the number of phrases.
+
+    Separators are dropped inside a phrase, so "k i l l my self" still
+    matches "kill myself", but a match must start at the beginning of a
+    word and end at the end of one, so "skill myself" and "weekend, my
+    life" don't. Categories in `prefix_categories` only need the start
+    boundary, so inflected endings ("self-harming", "suicides") still match;
+    use them where missing a match costs more than a false alarm.
+
+    Holding matches to word boundaries needs the spaces kept, which makes
+    the expression a lot slower to run. So one plain expression for every
+    phrase first runs over the bare letters, and only texts it hits are
+    checked again with one word-aware expression per category.
+    """
+
+    def __init__(self, phrases, prefix_categories=()):
+        """
+        `phrases` maps category -> iterable of phrases.
+        """
+        self._patterns = {}
+        all_keys = set()
+        for category, items in phrases.items():
+            keys = {normalize_for_matching(phrase) for phrase in items} - {''}
+            if keys:
+                all_keys |= keys
+                end = '' if category in prefix_categories else '(?![a-z])'
+                self._patterns[category] = re.compile(_trie_pattern(keys, spaced=True) + end)
+        self._candidate = re.compile(_trie_pattern(all_keys, spaced=False).encode('ascii')) if all_keys else None
+        self.categories = frozenset(phrases)
+
+    def scan(self, text):
+        """
+        Returns the set of categories whose phrases appear in `text` as whole words.
+        """
+        if self._candidate is None or not self._candidate.search(_letters(text)):
+            return set()
+        words = _words(text)
+        return {category for category, pattern in self._patterns.items() if pattern.search(words)}
+
+    def search(self, text):
+        """
+        True as soon as any phrase matches as whole words.
+        """
+        if self._candidate is None or not self._candidate.search(_letters(text)):
+            return False
+        words = _words(text)
+        return any(pattern.search(words) for pattern in self._patterns.values())
+
+
+def load_matcher(path=MODERATION_PHRASES_PATH):
+    with open(path, encoding='utf-8') as f:
+        return KeywordMatcher(json.load(f))
@@ -0,0 +1,134 @@
+# local_sentiment.py
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from keyword_matcher import KeywordMatcher
+
+EMOTIONS = ('Joy', 'Sadness', 'Anger', 'Fear', 'Surprise', 'Calm', 'Hopeful', 'Anxious', 'Love')
+
+# word -> {emotion: weight}. Small on purpose: anything it is unsure about goes to Gemini.
+LEXICON = {
+    'happy': {'Joy': 1.0}, 'glad': {'Joy': 0.8}, 'joy': {'Joy': 1.0}, 'great': {'Joy': 0.6},
+    'amazing': {'Joy': 0.9, 'Surprise': 0.3}, 'wonderful': {'Joy': 0.9}, 'fun': {'Joy': 0.7},
+    'excited': {'Joy': 0.8, 'Surprise': 0.3}, 'awesome': {'Joy': 0.8}, 'laugh': {'Joy': 0.7},
+    'laughed': {'Joy': 0.7}, 'smile': {'Joy': 0.6}, 'proud': {'Joy': 0.7}, 'good': {'Joy': 0.4},
+    'sad': {'Sadness': 1.0}, 'unhappy': {'Sadness': 0.9}, 'cry': {'Sadness': 0.9}, 'cried': {'Sadness': 0.9},
+    'crying': {'Sadness': 0.9}, 'lonely': {'Sadness': 0.9}, 'miss': {'Sadness': 0.6}, 'lost': {'Sadness': 0.5},
+    'down': {'Sadness': 0.4}, 'heartbroken': {'Sadness': 1.0}, 'grief': {'Sadness': 1.0}, 'hurt': {'Sadness': 0.6},
+    'disappointed': {'Sadness': 0.7}, 'upset': {'Sadness': 0.5, 'Anger': 0.4},
+    'angry': {'Anger': 1.0}, 'mad': {'Anger': 0.8}, 'furious': {'Anger': 1.0}, 'hate': {'Anger': 0.8},
+    'annoyed': {'Anger': 0.6}, 'frustrated': {'Anger': 0.7}, 'irritated': {'Anger': 0.6}, 'rage': {'Anger': 1.0},
+    'unfair': {'Anger': 0.5},
+    'scared': {'Fear': 1.0}, 'afraid': {'Fear': 1.0}, 'terrified': {'Fear': 1.0}, 'frightened': {'Fear': 0.9},
+    'fear': {'Fear': 0.9}, 'panic': {'Fear': 0.6, 'Anxious': 0.6},
+    'surprised': {'Surprise': 1.0}, 'shocked': {'Surprise': 0.9}, 'unexpected': {'Surprise': 0.7},
+    'suddenly': {'Surprise': 0.4}, 'wow': {'Surprise': 0.8},
+    'calm': {'Calm': 1.0}, 'peaceful': {'Calm': 1.0}, 'relaxed': {'Calm': 1.0}, 'quiet': {'Calm': 0.5},
+    'rested': {'Calm': 0.7}, 'content': {'Calm': 0.7, 'Joy': 0.3}, 'fine': {'Calm': 0.4},
+    'hopeful': {'Hopeful': 1.0}, 'hope': {'Hopeful': 0.8}, 'better': {'Hopeful': 0.5}, 'forward': {'Hopeful': 0.4},
+    'optimistic': {'Hopeful': 1.0}, 'looking': {'Hopeful': 0.2}, 'improving': {'Hopeful': 0.6},
+    'anxious': {'Anxious': 1.0}, 'nervous': {'Anxious': 0.9}, 'worried': {'Anxious': 0.9}, 'worry': {'Anxious': 0.8},
+    'stressed': {'Anxious': 0.9}, 'stress': {'Anxious': 0.8}, 'overwhelmed': {'Anxious': 0.9, 'Sadness': 0.3},
+    'tense': {'Anxious': 0.6}, 'restless': {'Anxious': 0.6},
+    'love': {'Love': 1.0}, 'loved': {'Love': 0.9}, 'loving': {'Love': 0.9}, 'adore': {'Love': 1.0},
+    'grateful': {'Love': 0.5, 'Joy': 0.5}, 'thankful': {'Love': 0.4, 'Joy': 0.5}, 'care': {'Love': 0.4},
+}
+NEGATIONS = frozenset({'not', 'no', 'never', "don't", "didn't", "isn't", "wasn't", "can't", 'cannot', "won't", 'hardly'})
+INTENSIFIERS = {'very': 1.5, 'so': 1.4, 'really': 1.4, 'extremely': 1.8, 'incredibly': 1.7, 'super': 1.5, 'totally': 1.4}
+
+# Any of these means Distress, no matter what else the entry says. Endings are matched
+# loosely ("self-harming"), but inflections inside a phrase have to be listed.
+DISTRESS_PHRASES = (
+    'kill myself', 'end my life', 'hurt myself', 'self harm', 'self-harm', 'suicide', 'suicidal',
+    'cut myself', 'want to die', 'no reason to live', 'take my life', 'better off dead',
+    'better off without me', 'give up on life', "don't want to be here", 'not want to live',
+    'killing myself', 'killed myself', 'ending my life', 'ended my life', 'hurting myself',
+    'cutting myself', 'harming myself', 'harm myself', 'taking my life', 'wanting to die', 'wanna die'
+)
+# These often mean Distress, but also turn up in ordinary entries ("the traffic was
+# hopeless"): Gemini decides, and Distress is only the fallback when it can't be reached
+DISTRESS_MAYBE_PHRASES = (
+    "can't go on", 'cannot go on', 'no way out', 'hopeless', 'worthless', 'hate myself', 'disappear forever'
+)
+# Softer signals: not enough to call Distress locally, but enough that Gemini should decide
+DISTRESS_HINTS = frozenset({'empty', 'numb', 'alone', 'exhausted', 'pointless', 'trapped', 'burden', 'broken', 'dark', 'useless'})
+
+# Below this the local label is only a fallback and Gemini makes the call
+LOCAL_SENTIMENT_MIN_CONFIDENCE = float(os.getenv("LOCAL_SENTIMENT_MIN_CONFIDENCE", "0.6"))
+_TOKEN = re.compile(r"[a-z']+")
+# Same evasion-resistant matching as chat moderation ("h0peless", "no-way-out")
+_distress_matcher = KeywordMatcher(
+    {'distress': DISTRESS_PHRASES, 'distress_maybe': DISTRESS_MAYBE_PHRASES},
+    prefix_categories=('distress', 'distress_maybe')
+)
+
+SentimentScore = namedtuple('SentimentScore', ['label', 'confidence'])
+
+# Compiled once: vocabulary index and a (vocab x emotions) weight matrix
+_VOCAB = {word: i for i, word in enumerate(LEXICON)}
+_WEIGHTS = np.zeros((len(LEXICON), len(EMOTIONS)), dtype=np.float32)
+for _word, _weights in LEXICON.items():
+    for _emotion, _weight in _weights.items():
+        _WEIGHTS[_VOCAB[_word], EMOTIONS.index(_emotion)] = _weight
+
+
+def classify_sentiment(text):
+    """
+    Scores a journal entry on-box and returns SentimentScore(label, confidence)
+    with the same "Emotion-Intensity" labels Gemini produces.
+
+    Distress phrases always win and come back with confidence 1.0, so they
+    never depend on a network call. Phrases are matched as whole words, so
+    "spend my life" is not "end my life". Ambiguous distress phrases come
+    back as Distress-High with low confidence: Gemini makes the call, and
+    Distress stands if it can't. Softer distress hints cap the confidence
+    so the entry goes to Gemini, and the label standing in if Gemini can't
+    answer is never Calm: with no clearer emotion it is Distress-Low.
+    Entries with no lexicon words get confidence 0.
+    """
+    distress = _distress_matcher.scan(text)
+    if 'distress' in distress:
+        return SentimentScore('Distress-High', 1.0)
+    if distress:
+        return SentimentScore('Distress-High', 0.3)
+
+    lowered = text.lower()
+    tokens = _TOKEN.findall(lowered)
+    if not tokens:
+        return SentimentScore('Calm-Low', 0.0)
+
+    ids = np.fromiter((_VOCAB.get(token, -1) for token in tokens), dtype=np.int64, count=len(tokens))
+    # Each word is scaled by the word right before it: negations flip, intensifiers boost
+    previous = [None] + tokens[:-1]
+    scale = np.fromiter(
+        (-0.8 if word in NEGATIONS else INTENSIFIERS.get(word, 1.0) for word in previous),
+        dtype=np.float32, count=len(tokens)
+    )
+    hinted = not DISTRESS_HINTS.isdisjoint(tokens)
+    hits = ids >= 0
+    if not hits.any():
+        return SentimentScore('Distress-Low', 0.3) if hinted else SentimentScore('Calm-Low', 0.0)
+
+    scores = (_WEIGHTS[ids[hits]] * scale[hits, None]).sum(axis=0)
+    scores = np.clip(scores, 0.0, None)
+    total = float(scores.sum())
+    if total <= 0.0:
+        # Only negated words ("not happy"): we know it's not positive, not what it is
+        return SentimentScore('Distress-Low', 0.1) if hinted else SentimentScore('Calm-Low', 0.1)
+
+    top = int(scores.argmax())
+    strength = float(scores[top]) * (1.0 + 0.1 * min(text.count('!'), 5))
+    intensity = 'Low' if strength < 1.2 else 'Medium' if strength < 2.5 else 'High'
+
+    # How much the top emotion dominates, damped when there is little evidence
+    share = float(scores[top]) / total
+    evidence = 1.0 - float(np.exp(-total))
+    confidence = round(share * evidence, 3)
+    if hinted:
+        if EMOTIONS[top] == 'Calm':
+            return SentimentScore('Distress-Low', min(confidence, 0.3))
+        confidence = min(confidence, 0.3)
+    return SentimentScore(f"{EMOTIONS[top]}-{intensity}", confidence)
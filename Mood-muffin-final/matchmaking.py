@@ -0,0 +1,102 @@
+# matchmaking.py
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class Matchmaker:
+    """
+    Pairs waiting strangers into rooms.
+
+    Waiting sids live in an ordered set (an OrderedDict with no values) so
+    joining, cancelling and popping the longest waiter are all O(1). Rooms are
+    indexed both ways (room -> sids and sid -> room) so ending a chat or
+    tearing down a disconnected sid never scans other rooms.
+
+    Two locks instead of one global lock: `_queue_lock` guards the waiting
+    set and `_rooms_lock` guards the room indexes. Pairing takes them in that
+    order; relaying messages only needs room reads and takes neither.
+    """
+
+    def __init__(self):
+        self._waiting = OrderedDict()
+        self._rooms = {}       # room_id -> (sid1, sid2)
+        self._sid_room = {}    # sid -> room_id
+        self._queue_lock = threading.Lock()
+        self._rooms_lock = threading.Lock()
+
+    def enqueue(self, sid):
+        """
+        Adds a sid to the waiting set. If someone was already waiting, pairs
+        them and returns (room_id, waiting_sid, sid), otherwise None.
+        """
+        with self._queue_lock:
+            if sid in self._waiting or sid in self._sid_room:
+                return None
+            if not self._waiting:
+                self._waiting[sid] = None
+                return None
+            other_sid, _ = self._waiting.popitem(last=False)
+            room_id = str(uuid.uuid4())
+            # Created under the queue lock so a disconnect can't slip in between
+            # leaving the queue and joining the room.
+            with self._rooms_lock:
+                self._rooms[room_id] = (other_sid, sid)
+                self._sid_room[other_sid] = room_id
+                self._sid_room[sid] = room_id
+        return room_id, other_sid, sid
+
+    def cancel(self, sid):
+        """
+        Removes a sid from the waiting set. Returns True if it was waiting.
+        """
+        with self._queue_lock:
+            if sid not in self._waiting:
+                return False
+            del self._waiting[sid]
+            return True
+
+    def partner(self, room_id, sid):
+        """
+        Returns the other sid in the room, or None if sid isn't in that room.
+        """
+        # Plain dict reads are atomic, and room tuples are never mutated.
+        users = self._rooms.get(room_id)
+        if not users or sid not in users:
+            return None
+        return users[1] if users[0] == sid else users[0]
+
+    def end(self, room_id, sid):
+        """
+        Closes the room if sid belongs to it and returns the other sid.
+        """
+        with self._rooms_lock:
+            users = self._rooms.get(room_id)
+            if not users or sid not in users:
+                return None
+            return self._close(room_id, sid)
+
+    def disconnect(self, sid):
+        """
+        Forgets everything about a sid. Returns (room_id, other_sid) if it was
+        in a chat, otherwise None.
+        """
+        if self.cancel(sid):
+            return None
+        with self._rooms_lock:
+            room_id = self._sid_room.get(sid)
+            if room_id is None:
+                return None
+            return room_id, self._close(room_id, sid)
+
+    def waiting_count(self):
+        return len(self._waiting)
+
+    def room_count(self):
+        return len(self._rooms)
+
+    def _close(self, room_id, sid):
+        sid1, sid2 = self._rooms.pop(room_id)
+        del self._sid_room[sid1]
+        del self._sid_room[sid2]
+        return sid2 if sid1 == sid else sid1
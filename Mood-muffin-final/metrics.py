@@ -0,0 +1,231 @@
+# metrics.py
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from sub-millisecond socket relays up to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Lock waits and holds, from uncontended microseconds up to badly stuck
+LOCK_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 1.0)
+# Shards of exited threads are folded in once a metric has at least this many
+SHARD_RETIRE_MIN = 64
+
+
+class _Metric:
+    """
+    Base for counters and histograms.
+
+    Writes never take a lock: every thread gets its own shard (a dict of
+    label values -> numbers) and only ever touches that. Scrapes add the
+    shards up. Shards of threads that have exited are folded into `_retired`
+    on scrape, and also whenever the shard list has doubled since the last
+    fold, so per-request threads don't pile up even if nothing scrapes.
+
+    A thread counts as exited once its thread-local owner token is gone,
+    which also works for gevent greenlets (their dummy threads never report
+    themselves dead).
+    """
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []       # (weakref to the owning thread's token, shard)
+        self._retired = {}
+        self._retire_at = SHARD_RETIRE_MIN
+        self._lock = threading.Lock()   # only for shard registration and scrapes
+        REGISTRY.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            token = self._local.token = _Token()
+            with self._lock:
+                self._shards.append((weakref.ref(token), shard))
+                if len(self._shards) >= self._retire_at:
+                    # Amortized: the next fold waits until the live shards have doubled again
+                    self._retire_dead()
+                    self._retire_at = max(SHARD_RETIRE_MIN, 2 * len(self._shards))
+        return shard
+
+    def _retire_dead(self):
+        # Caller holds self._lock
+        live = []
+        for owner, shard in self._shards:
+            if owner() is not None:
+                live.append((owner, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def _collect(self):
+        with self._lock:
+            self._retire_dead()
+            total = {}
+            self._merge(total, self._retired)
+            for _, shard in self._shards:
+                self._merge(total, shard)
+        return total
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class _Token:
+    __slots__ = ('__weakref__',)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, value in list(shard.items()):
+            into[labels] = into.get(labels, 0) + value
+
+    def render(self):
+        return [f"{self.name}{self._labels(labels)} {value}" for labels, value in sorted(self._collect().items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            # per-bucket counts, then +Inf count, then sum
+            row = shard[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, row in list(shard.items()):
+            total = into.get(labels)
+            if total is None:
+                into[labels] = list(row)
+            else:
+                for i, value in enumerate(row):
+                    total[i] += value
+
+    def render(self):
+        lines = []
+        for labels, row in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(labels, [('le', repr(bound))])} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{self._labels(labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {row[-1]}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class Callback:
+    """
+    A gauge or counter read from a function at scrape time. The function
+    returns a number, or a list of (label values, number) pairs.
+    """
+
+    def __init__(self, name, help, fn, labelnames=(), kind='gauge'):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        REGISTRY.append(self)
+
+    def render(self):
+        value = self.fn()
+        if not isinstance(value, list):
+            return [f"{self.name} {value}"]
+        lines = []
+        for labels, number in value:
+            pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{pairs}}} {number}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """
+    Returns every registered metric in Prometheus text format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# -----------------------
+# App metrics
+# -----------------------
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Flask request latency', ('route', 'method', 'status'))
+EVENT_LATENCY = Histogram('socketio_event_duration_seconds', 'Socket.IO event handler latency', ('event',))
+UPSTREAM_LATENCY = Histogram('upstream_call_duration_seconds', 'Outbound call latency', ('service', 'operation', 'outcome'))
+MODERATION_VERDICTS = Counter('moderation_verdicts_total', 'Chat moderation verdicts', ('verdict',))
+KEYWORD_MATCHES = Counter('moderation_keyword_matches_total', 'Chat messages the keyword prefilter sent to the model, by category', ('category',))
+SENTIMENT_OUTCOMES = Counter('sentiment_outcomes_total', 'Sentiment analysis outcomes', ('source', 'outcome'))
+FALLBACKS = Counter('fallbacks_total', 'Times a component fell back to its default behaviour', ('component', 'reason'))
+RATE_LIMITED = Counter('rate_limited_total', 'Requests and events refused by a rate limiter', ('scope',))
+UPSTREAM_REJECTIONS = Counter('upstream_rejections_total', 'Calls the upstream guard refused to send', ('service', 'reason'))
+# Only recorded while /admin/profile runs, see profiling.py
+LOCK_WAIT = Histogram('lock_wait_seconds', 'Time spent waiting for an instrumented lock', ('lock',), buckets=LOCK_BUCKETS)
+LOCK_HOLD = Histogram('lock_hold_seconds', 'Time an instrumented lock was held', ('lock',), buckets=LOCK_BUCKETS)
+
+
+@contextmanager
+def time_upstream(service, operation):
+    """
+    Times an outbound call, labelled 'ok' or 'error' depending on whether it raised.
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, service, operation, outcome)
+
+
+def timed_event(event):
+    """
+    Decorator recording a Socket.IO handler's latency under `event`.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                EVENT_LATENCY.observe(time.perf_counter() - start, event)
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+# moderation_pipeline.py
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as VerdictTimeout
+
+from metrics import MODERATION_VERDICTS
+
+
+class ModerationPipeline:
+    """
+    Runs content checks off the socket handler thread.
+
+    Messages are queued per room and each room is drained by at most one
+    worker at a time, so messages are checked and relayed in the order they
+    were sent. Rooms take turns, so one busy room can't starve the others.
+
+    `check(message)` returns True for unsafe content. `relay(room_id, sid,
+    message, unsafe)` is called once per message with the final verdict.
+    If the check doesn't answer within `deadline` seconds the verdict comes
+    from `on_timeout`: 'block' treats the message as unsafe (same as the
+    error path of the checker), 'allow' lets it through.
+
+    `screen(message)`, if given, is a cheap test run inline by the room
+    worker: messages it returns False for are safe without calling `check`.
+    Checks run on a pool of `workers` threads, and at most that many are in
+    flight. A check that misses its deadline keeps its slot until it
+    returns, so slow checks can only make other checks wait, never the
+    messages the screen passes.
+
+    Every checked message is counted once in moderation_verdicts_total, as
+    'safe', 'unsafe', 'timeout' or 'error'.
+
+    At most `max_pending` messages can wait across all rooms. `submit`
+    returns False once that limit is reached and the caller decides what to
+    tell the sender.
+    """
+
+    def __init__(self, check, relay, workers=4, max_pending=1000, deadline=3.0, on_timeout='block', screen=None):
+        if on_timeout not in ('block', 'allow'):
+            raise ValueError(f"on_timeout must be 'block' or 'allow', got {on_timeout!r}")
+        self.check = check
+        self.screen = screen
+        self.relay = relay
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        self.max_pending = max_pending
+
+        self._rooms = {}             # room_id -> deque of (sid, message)
+        self._ready = queue.Queue()  # room ids with messages and no worker on them
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._checks = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='moderation-check')
+        self._check_slots = threading.BoundedSemaphore(workers)
+        self._workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work, name=f'moderation-worker-{i}', daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def submit(self, room_id, sid, message):
+        """
+        Queues a message for checking. Returns False if the pipeline is full.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            backlog = self._rooms.get(room_id)
+            if backlog is None:
+                # No worker owns this room right now, hand it to one.
+                self._rooms[room_id] = deque([(sid, message)])
+                self._ready.put(room_id)
+            else:
+                backlog.append((sid, message))
+        return True
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def _verdict(self, message):
+        """
+        Returns (unsafe, outcome), outcome being the label the verdict is counted under.
+        """
+        try:
+            if self.screen is not None and not self.screen(message):
+                return False, 'safe'
+        except Exception as e:
+            print(f"Error in moderation screen: {e}")
+            return True, 'error'
+
+        deadline = time.monotonic() + self.deadline
+        # A slot per pool thread, so checks never queue up inside the executor
+        if not self._check_slots.acquire(timeout=self.deadline):
+            print(f"No moderation check slot freed up within {self.deadline}s, applying '{self.on_timeout}' policy")
+            return self.on_timeout == 'block', 'timeout'
+        future = self._checks.submit(self.check, message)
+        future.add_done_callback(lambda _: self._check_slots.release())
+        try:
+            unsafe = future.result(timeout=max(deadline - time.monotonic(), 0))
+            return unsafe, 'unsafe' if unsafe else 'safe'
+        except VerdictTimeout:
+            future.cancel()
+            print(f"Moderation verdict missed the {self.deadline}s deadline, applying '{self.on_timeout}' policy")
+            return self.on_timeout == 'block', 'timeout'
+        except Exception as e:
+            print(f"Error in moderation check: {e}")
+            return True, 'error'
+
+    def _work(self):
+        while True:
+            room_id = self._ready.get()
+            with self._lock:
+                sid, message = self._rooms[room_id].popleft()
+
+            unsafe, outcome = self._verdict(message)
+            MODERATION_VERDICTS.inc(outcome)
+            try:
+                self.relay(room_id, sid, message, unsafe)
+            except Exception as e:
+                print(f"Error relaying message in room {room_id}: {e}")
+
+            with self._lock:
+                self._pending -= 1
+                if self._rooms[room_id]:
+                    # Go to the back of the line so other rooms get a turn.
+                    self._ready.put(room_id)
+                else:
+                    del self._rooms[room_id]
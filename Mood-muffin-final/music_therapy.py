@@ -1,66 +1,125 @@
 # music_therapy.py
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+JOURNEY_CATALOG_PATH = os.getenv("JOURNEY_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "journeys.json"))
+JOURNEY_CATALOG_CHECK_SECONDS = float(os.getenv("JOURNEY_CATALOG_CHECK_SECONDS", "5"))
+
+class JourneyCatalog:
+    """
+    The journeys file compiled into read-only lookup tables:
+    - plans: emotion -> tuple of read-only stage mappings
+    - stages: (emotion, intensity) -> stage name
+    - labels: "Emotion-Intensity" -> stage name, so the common case needs no parsing
+    """
+    __slots__ = ('plans', 'stages', 'labels', 'intensities', 'mtime')
+
+    def __init__(self, data, mtime=None):
+        intensities = tuple(data['intensities'])
+        plans, stages, labels = {}, {}, {}
+        for emotion, journey in data['journeys'].items():
+            if not journey:
+                raise ValueError(f"Journey for {emotion} has no stages")
+            for stage in journey:
+                if 'label' not in stage or 'playlist_uri' not in stage:
+                    raise ValueError(f"Every {emotion} stage needs a label and a playlist_uri")
+            plan = tuple(MappingProxyType(dict(stage)) for stage in journey)
+            plans[emotion] = plan
+            for index, intensity in enumerate(intensities):
+                # Shorter journeys reuse their last stage for higher intensities
+                name = plan[min(index, len(plan) - 1)]['label']
+                stages[(emotion, intensity)] = name
+                labels[f"{emotion}-{intensity}"] = name
+        if 'Default' not in plans:
+            raise ValueError("Journey catalog needs a 'Default' journey")
+
+        self.plans = MappingProxyType(plans)
+        self.stages = MappingProxyType(stages)
+        self.labels = MappingProxyType(labels)
+        self.intensities = intensities
+        self.mtime = mtime
+
+    def __setattr__(self, name, value):
+        if hasattr(self, 'mtime'):
+            raise AttributeError("JourneyCatalog is immutable, load a new one instead")
+        object.__setattr__(self, name, value)
+
+def load_catalog(path=JOURNEY_CATALOG_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return JourneyCatalog(data, mtime=os.path.getmtime(path))
+
+# Swapped as a whole on reload, so readers always see one complete catalog
+_catalog = load_catalog()
+_reload_lock = threading.Lock()
+
+def reload_catalog(path=JOURNEY_CATALOG_PATH):
+    """
+    Loads the catalog again and swaps it in. A broken file is reported and
+    the current catalog is kept. Returns True if the catalog was replaced.
+    """
+    global _catalog
+    with _reload_lock:
+        try:
+            catalog = load_catalog(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not reload journey catalog from {path}, keeping the current one: {e}")
+            return False
+        _catalog = catalog
+    print(f"Journey catalog reloaded from {path}")
+    return True
+
+def watch_catalog(path=JOURNEY_CATALOG_PATH, interval=JOURNEY_CATALOG_CHECK_SECONDS):
+    """
+    Starts a background thread that reloads the catalog whenever the file changes.
+    """
+    def watch():
+        seen = _catalog.mtime
+        while True:
+            time.sleep(interval)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError as e:
+                print(f"Could not check journey catalog {path}: {e}")
+                continue
+            # Try each version of the file once, a broken save waits for the next one
+            if mtime != seen:
+                seen = mtime
+                reload_catalog(path)
+
+    thread = threading.Thread(target=watch, name='journey-catalog-watch', daemon=True)
+    thread.start()
+    return thread
 
 def get_stage_for_emotion(emotion_analysis):
     """
     The "GPS Navigator": Determines the CURRENT stage name based on emotion and intensity.
     """
-    emotion, intensity = emotion_analysis.split('-')
-
-    stage_index = 0  # Default to stage 1 for Low intensity
-    if intensity == 'Medium':
-        stage_index = 1  # Stage 2
-    elif intensity == 'High':
-        stage_index = 2  # Stage 3
+    catalog = _catalog
+    stage_name = catalog.labels.get(emotion_analysis)
+    if stage_name is not None:
+        return stage_name
 
-    journeys = {
-        'Sadness': ['Acknowledge & Validate', 'Process & Reflect', 'Empower & Uplift'],
-        'Anger': ['Match the Intensity', 'Channel & Process', 'Cool Down & Calm'],
-        'Distress': ['Safe Space', 'Gentle Reflection', 'Finding Hope'],
-        'Joy': ['Embrace the Joy', 'Amplify the Feeling', 'Sustained Happiness'],
-        'Default': ['Acknowledgment', 'Reflection', 'Empowerment']
-    }
-    
-    stage_names = journeys.get(emotion, journeys['Default'])
-    
-    # Ensure we don't go out of bounds
-    if stage_index >= len(stage_names):
-        stage_index = len(stage_names) - 1
-        
-    return stage_names[stage_index]
+    # Unknown emotion or odd intensity: fall back like the original rules did
+    emotion, _, intensity = emotion_analysis.partition('-')
+    if intensity not in catalog.intensities:
+        intensity = catalog.intensities[0]
+    return catalog.stages.get((emotion, intensity)) or catalog.stages[('Default', intensity)]
 
 def create_emotional_journey_plan(emotion_analysis):
     """
     Creates the FULL three-stage plan with playlist URIs for each stage.
+    The plan is shared and read-only; copy a stage before changing it.
     """
-    emotion, _ = emotion_analysis.split('-')  # We only need the emotion type
-
-    # Map each stage to the corresponding playlist URI
-    journeys = {
-        'Sadness': [
-            {'label': 'Acknowledge & Validate', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX7qK8ma5wgG1'},
-            {'label': 'Process & Reflect', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX4sWSpwq3LiO'},
-            {'label': 'Empower & Uplift', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX0XUsuxWHRQd'}
-        ],
-        'Anger': [
-            {'label': 'Match the Intensity', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'},
-            {'label': 'Channel & Process', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX0XUsuxWHRQd'},
-            {'label': 'Cool Down & Calm', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX4sWSpwq3LiO'}
-        ],
-        'Distress': [
-            {'label': 'Safe Space', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX4sWSpwq3LiO'},
-            {'label': 'Gentle Reflection', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX4sWSpwq3LiO'},
-            {'label': 'Finding Hope', 'playlist_uri': 'spotify:playlist:37i9dQZF1DX4sWSpwq3LiO'}
-        ],
-        'Joy': [
-            {'label': 'Embrace the Joy', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'},
-            {'label': 'Amplify the Feeling', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'},
-            {'label': 'Sustained Happiness', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'}
-        ],
-        'Default': [
-            {'label': 'Acknowledgment', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'},
-            {'label': 'Reflection', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'},
-            {'label': 'Empowerment', 'playlist_uri': 'spotify:playlist:37i9dQZF1DXcBWIGoYBM5M'}
-        ]
-    }
+    plans = _catalog.plans
+    emotion = emotion_analysis.split('-')[0]  # We only need the emotion type
+    return plans.get(emotion) or plans['Default']
 
-    return journeys.get(emotion, journeys['Default'])
\ No newline at end of file
+def all_journey_stages():
+    """
+    Every stage of every journey, used to pre-warm the playlist cache.
+    """
+    return [stage for plan in _catalog.plans.values() for stage in plan]
@@ -1,24 +1,89 @@
 # playlist_builder.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from spotify_data_fetcher import get_user_market, get_playlist_uri
-from music_therapy import create_emotional_journey_plan
+from music_therapy import create_emotional_journey_plan, all_journey_stages
+from playlist_cache import PlaylistCache
+from single_flight import SingleFlight
+
+PLAYLIST_LOOKUP_WORKERS = int(os.getenv("PLAYLIST_LOOKUP_WORKERS", "4"))
+
+# Shared by every request so lookups stay bounded however many journeys are being built
+_lookup_pool = ThreadPoolExecutor(max_workers=PLAYLIST_LOOKUP_WORKERS, thread_name_prefix='playlist-lookup')
+playlist_cache = PlaylistCache()
+_in_flight = SingleFlight()
+
+def stage_search_name(stage):
+    """
+    The name a stage's playlist is searched by on Spotify.
+    """
+    return stage.get('playlist', stage['label'])
+
+def stage_needs_search(stage):
+    """
+    Curated URIs are used as they are. Only stages that name a `playlist` to
+    find in the user's market are searched for, their URI is the fallback.
+    """
+    return 'playlist' in stage
+
+def resolve_playlist_uri(sp_client, playlist_name, market):
+    """
+    Looks a playlist up in the disk cache first and only searches Spotify on a miss.
+    """
+    found, playlist_uri = playlist_cache.lookup(market, playlist_name)
+    if found:
+        return playlist_uri
+    # Journeys built at the same moment share one search per playlist
+    return _in_flight.do((market, playlist_name), _search_and_store, sp_client, playlist_name, market)
+
+def _search_and_store(sp_client, playlist_name, market):
+    playlist_uri = get_playlist_uri(sp_client, playlist_name, market=market)
+    playlist_cache.set(market, playlist_name, playlist_uri)
+    return playlist_uri
 
 def build_journey_playlists(sp_client, sentiment):
     """
     Builds a journey playlist structure using the new playlist-based approach.
-    Note: This function is kept as a placeholder. The main logic is now in routes.py.
+    Stages with a curated URI keep it. The rest are resolved concurrently,
+    and a named playlist whose search finds nothing falls back to the curated URI.
     """
     user_market = get_user_market(sp_client) or "US"
     journey_plan = create_emotional_journey_plan(sentiment)
     journey_playlists = []
-    
-    for stage in journey_plan:
-        playlist_name = stage['playlist']
-        playlist_uri = get_playlist_uri(sp_client, playlist_name)
+
+    lookups = [
+        _lookup_pool.submit(resolve_playlist_uri, sp_client, stage_search_name(stage), user_market)
+        if stage_needs_search(stage) else None
+        for stage in journey_plan
+    ]
+    for stage, lookup in zip(journey_plan, lookups):
+        playlist_uri = (lookup and lookup.result()) or stage.get('playlist_uri')
         if playlist_uri:
             journey_playlists.append({
                 'label': stage['label'],
                 'playlist_uri': playlist_uri,
                 'market': user_market
             })
-    
-    return journey_playlists if journey_playlists else None
\ No newline at end of file
+
+    return journey_playlists if journey_playlists else None
+
+def catalog_search_names():
+    """
+    The playlist names in the journey catalog that are looked up per market.
+    """
+    return sorted({stage_search_name(stage) for stage in all_journey_stages() if stage_needs_search(stage)})
+
+def prewarm_playlist_cache(sp_client, markets):
+    """
+    Resolves every named playlist in the journey catalog for each market so
+    that building a journey normally needs no search calls. Returns how many
+    lookups actually went to Spotify.
+    """
+    names = catalog_search_names()
+    searched = 0
+    for market in markets:
+        misses_before = playlist_cache.misses
+        list(_lookup_pool.map(lambda name: resolve_playlist_uri(sp_client, name, market), names))
+        searched += playlist_cache.misses - misses_before
+    return searched
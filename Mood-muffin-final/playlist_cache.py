@@ -0,0 +1,61 @@
+# playlist_cache.py
+import os
+import sqlite3
+import threading
+import time
+
+PLAYLIST_CACHE_PATH = os.getenv("PLAYLIST_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "playlist_cache.db"))
+PLAYLIST_CACHE_TTL_SECONDS = int(os.getenv("PLAYLIST_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# "No playlist found" is remembered too, but not for as long
+PLAYLIST_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("PLAYLIST_CACHE_NEGATIVE_TTL_SECONDS", str(60 * 60)))
+
+
+class PlaylistCache:
+    """
+    Disk-backed playlist name -> URI cache, keyed by market since search
+    results differ per country. Survives restarts and is shared by every
+    worker on the box through SQLite.
+    """
+
+    def __init__(self, path=PLAYLIST_CACHE_PATH, ttl=PLAYLIST_CACHE_TTL_SECONDS,
+                 negative_ttl=PLAYLIST_CACHE_NEGATIVE_TTL_SECONDS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS playlist_uris ("
+            " market TEXT NOT NULL, name TEXT NOT NULL, uri TEXT, fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (market, name))"
+        )
+
+    def lookup(self, market, name):
+        """
+        Returns (True, uri) for a fresh entry, where uri is None if the search
+        found nothing last time, or (False, None) when Spotify must be asked.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uri, fetched_at FROM playlist_uris WHERE market = ? AND name = ?", (market, name)
+            ).fetchone()
+        if row is not None:
+            uri, fetched_at = row
+            if time.time() - fetched_at < (self.ttl if uri else self.negative_ttl):
+                self.hits += 1
+                return True, uri
+        self.misses += 1
+        return False, None
+
+    def set(self, market, name, uri):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO playlist_uris (market, name, uri, fetched_at) VALUES (?, ?, ?, ?)",
+                (market, name, uri, time.time())
+            )
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
@@ -0,0 +1,242 @@
+# profiling.py
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from metrics import LOCK_HOLD, LOCK_WAIT
+
+# /admin/profile is only served when this is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_PSTATS_LINES = 60
+
+MODES = ('cprofile', 'stack')
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def check_admin_token(header):
+    """
+    True if an "Authorization: Bearer <token>" header carries ADMIN_TOKEN.
+    """
+    if not ADMIN_TOKEN or not header or not header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(header[len('Bearer '):].encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+class InstrumentedLock:
+    """
+    Wraps a threading.Lock and records how long callers waited for it and
+    how long they held it, in the lock_wait_seconds and lock_hold_seconds
+    histograms. Only swapped in while a profile runs.
+    """
+    __slots__ = ('name', 'lock', 'stats', '_acquired_at')
+
+    def __init__(self, name, lock, stats):
+        self.name = name
+        self.lock = lock
+        self.stats = stats      # shared [count, wait total, wait max, hold total, hold max]
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = now = time.perf_counter()
+            waited = now - start
+            LOCK_WAIT.observe(waited, self.name)
+            self.stats[0] += 1
+            self.stats[1] += waited
+            self.stats[2] = max(self.stats[2], waited)
+        return acquired
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self.stats[3] += held
+        self.stats[4] = max(self.stats[4], held)
+        self.lock.release()
+        LOCK_HOLD.observe(held, self.name)
+
+    def locked(self):
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Profiler:
+    """
+    On-demand profiling of chosen handlers, one session at a time.
+
+    A session swaps each target handler for a profiling wrapper and each
+    watched lock for an InstrumentedLock, then puts the originals back when
+    it ends. Nothing is wrapped between sessions, so profiling costs nothing
+    while it is off.
+
+    Handlers and locks are given as (owner, key) pairs: a dict and its key,
+    e.g. (app.view_functions, endpoint), or an object and an attribute name.
+
+    Modes:
+      cprofile  runs cProfile around a `sample` fraction of calls, returns pstats text
+      stack     samples the stacks of threads inside a target every few ms and
+                returns collapsed stacks ("frame;frame;frame count" lines) for
+                flamegraph.pl or speedscope
+
+    cProfile and stack sampling both see OS threads. Under gevent, greenlets
+    share one thread, so stack mode is unavailable and cProfile output also
+    includes whatever other greenlets ran during a profiled call.
+    """
+
+    def __init__(self, sample_interval=PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.sample_interval = sample_interval
+        self._session_lock = threading.Lock()
+
+    def run(self, targets, locks, mode='cprofile', seconds=10, sample=1.0):
+        """
+        Profiles `targets` (label -> (container, key)) for `seconds` and
+        returns the report. Raises ProfilerBusy if a session is already running.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        if not self._session_lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            session = _Session(mode, sample)
+            originals = []
+            try:
+                for label, (owner, key) in targets.items():
+                    original = _get(owner, key)
+                    originals.append((owner, key, original))
+                    _set(owner, key, session.wrap(label, original))
+                for name, (owner, key) in locks.items():
+                    original = _get(owner, key)
+                    originals.append((owner, key, original))
+                    _set(owner, key, InstrumentedLock(name, original, session.lock_stats(name)))
+
+                if mode == 'stack':
+                    session.sample_stacks(seconds, self.sample_interval)
+                else:
+                    time.sleep(seconds)
+            finally:
+                for owner, key, original in reversed(originals):
+                    _set(owner, key, original)
+            return session.report(seconds)
+        finally:
+            self._session_lock.release()
+
+
+def _get(owner, key):
+    return owner[key] if isinstance(owner, dict) else getattr(owner, key)
+
+
+def _set(owner, key, value):
+    if isinstance(owner, dict):
+        owner[key] = value
+    else:
+        setattr(owner, key, value)
+
+
+class _Session:
+    def __init__(self, mode, sample):
+        self.mode = mode
+        self.sample = sample
+        self.calls = 0
+        self.profiled = 0
+        self._stats = None
+        self._stacks = Counter()
+        self._active = {}       # thread id -> target label, for the stack sampler
+        self._wrapper_codes = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, label, handler):
+        if self.mode == 'stack':
+            @wraps(handler)
+            def sampled(*args, **kwargs):
+                thread_id = threading.get_ident()
+                self.calls += 1
+                self._active[thread_id] = label
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    self._active.pop(thread_id, None)
+            self._wrapper_codes.add(sampled.__code__)
+            return sampled
+
+        @wraps(handler)
+        def profiled(*args, **kwargs):
+            self.calls += 1
+            if random.random() >= self.sample:
+                return handler(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is already running on this thread
+                return handler(*args, **kwargs)
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self.profiled += 1
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profile)
+                    else:
+                        self._stats.add(profile)
+        return profiled
+
+    def lock_stats(self, name):
+        return self._locks.setdefault(name, [0, 0.0, 0.0, 0.0, 0.0])
+
+    def sample_stacks(self, seconds, interval):
+        deadline = time.perf_counter() + seconds
+        own_thread = threading.get_ident()
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            for thread_id, label in list(self._active.items()):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_thread:
+                    continue
+                stack = []
+                # Cut at the wrapper, so only the handler's own frames show up
+                while frame is not None and frame.f_code not in self._wrapper_codes:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(label)
+                self._stacks[';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+
+    def report(self, seconds):
+        if self.mode == 'stack':
+            return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+        out = io.StringIO()
+        out.write(f"{self.profiled} of {self.calls} calls profiled in {seconds}s\n")
+        for name, (count, wait, max_wait, hold, max_hold) in sorted(self._locks.items()):
+            if count:
+                out.write(
+                    f"lock {name}: {count} acquisitions, wait avg {wait / count * 1e6:.1f}us max {max_wait * 1e6:.1f}us,"
+                    f" hold avg {hold / count * 1e6:.1f}us max {max_hold * 1e6:.1f}us\n"
+                )
+        out.write('\n')
+        if self._stats is not None:
+            self._stats.stream = out
+            self._stats.sort_stats('cumulative').print_stats(PROFILE_PSTATS_LINES)
+        return out.getvalue()
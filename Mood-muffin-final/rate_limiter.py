@@ -0,0 +1,74 @@
+# rate_limiter.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Chat messages, per socket and per client IP (several tabs or a shared NAT)
+CHAT_RATE_PER_SID = float(os.getenv("CHAT_RATE_PER_SID", "1"))
+CHAT_BURST_PER_SID = float(os.getenv("CHAT_BURST_PER_SID", "5"))
+CHAT_RATE_PER_IP = float(os.getenv("CHAT_RATE_PER_IP", "5"))
+CHAT_BURST_PER_IP = float(os.getenv("CHAT_BURST_PER_IP", "20"))
+# Sentiment routes, per client IP
+AI_ROUTE_RATE_PER_IP = float(os.getenv("AI_ROUTE_RATE_PER_IP", "0.5"))
+AI_ROUTE_BURST_PER_IP = float(os.getenv("AI_ROUTE_BURST_PER_IP", "10"))
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+RATE_LIMIT_IDLE_SECONDS = float(os.getenv("RATE_LIMIT_IDLE_SECONDS", "600"))
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key: holds up to `burst` tokens and refills at
+    `rate` tokens per second.
+
+    Buckets are kept in least-recently-used order, so evicting idle keys only
+    ever looks at the front: at most `max_keys` buckets are kept, and a bucket
+    untouched for `idle_seconds` is dropped. A dropped bucket would have
+    refilled completely by then anyway, so eviction never changes a verdict.
+    """
+
+    def __init__(self, rate, burst, max_keys=RATE_LIMIT_MAX_KEYS, idle_seconds=RATE_LIMIT_IDLE_SECONDS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_seconds = max(idle_seconds, burst / rate)
+        self._buckets = OrderedDict()   # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cost=1):
+        """
+        Takes `cost` tokens from the key's bucket. Returns 0 when allowed,
+        otherwise the seconds until enough tokens will be there.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            self._evict(now)
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+    def forget(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+        while buckets:
+            _, (_, last) = next(iter(buckets.items()))
+            if now - last < self.idle_seconds:
+                break
+            buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
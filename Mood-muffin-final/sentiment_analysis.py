@@ -1,17 +1,206 @@
 # sentiment_analysis.py
 import os
+import re
 import json
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_transport import post_json
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from metrics import FALLBACKS, SENTIMENT_OUTCOMES, time_upstream
+from upstream_guard import gemini_guard, UpstreamUnavailable
+
+# Journal autosave re-sends the same text a lot, so remember recent labels
+sentiment_cache = TTLCache(
+    maxsize=int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "5000")),
+    ttl=float(os.getenv("SENTIMENT_CACHE_TTL_SECONDS", "86400"))
+)
+_in_flight = SingleFlight()
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+
+# Batch calls: how much journal text goes into one prompt, and how many
+# batch prompts may be in flight at once across the whole process
+SENTIMENT_BATCH_TOKEN_BUDGET = int(os.getenv("SENTIMENT_BATCH_TOKEN_BUDGET", "6000"))
+SENTIMENT_BATCH_MAX_ENTRIES = int(os.getenv("SENTIMENT_BATCH_MAX_ENTRIES", "40"))
+SENTIMENT_BATCH_CONCURRENCY = int(os.getenv("SENTIMENT_BATCH_CONCURRENCY", "4"))
+_batch_pool = ThreadPoolExecutor(max_workers=SENTIMENT_BATCH_CONCURRENCY, thread_name_prefix='sentiment-batch')
+
+class FallbackLabel(str):
+    """
+    The default label that stands in when Gemini's answer can't be parsed.
+    Callers use it like any label, but it is never cached.
+    """
+
+def _cacheable(result):
+    return isinstance(result, str) and not isinstance(result, FallbackLabel)
+
+_BATCH_LINE = re.compile(r"^\W*(\d+)\W+([A-Za-z]+)\s*-\s*(Low|Medium|High)\b", re.IGNORECASE | re.MULTILINE)
 
 def analyze_sentiment_with_gemini(text):
     """
     Analyzes the text for a specific emotion, prioritizing the detection of distress.
+    Results are cached by content hash, and concurrent calls for the same text
+    share a single upstream request.
     """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         print("Error: GEMINI_API_KEY is not available.")
+        SENTIMENT_OUTCOMES.inc('gemini', 'not_configured')
         return {"error": "The sentiment analysis service is not configured."}
 
+    key = hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+    cached = sentiment_cache.get(key)
+    if cached is not None:
+        SENTIMENT_OUTCOMES.inc('gemini', 'cache_hit')
+        return cached
+
+    return _in_flight.do(key, _request_and_cache, key, text, api_key)
+
+def _request_and_cache(key, text, api_key):
+    # Runs as the single-flight leader, so the label is cached before later
+    # callers stop waiting on this request and start their own
+    cached = sentiment_cache.get(key)
+    if cached is not None:
+        SENTIMENT_OUTCOMES.inc('gemini', 'cache_hit')
+        return cached
+    result = _request_sentiment(text, api_key)
+    # Only real labels are cached, error dicts and stand-in labels should be retried next time
+    if _cacheable(result):
+        sentiment_cache.set(key, result)
+    return result
+
+def analyze_sentiment_batch(texts):
+    """
+    Labels many journal entries with as few Gemini calls as possible.
+    Returns one result per entry, in order: a label string, or an error
+    dict just like analyze_sentiment_with_gemini.
+
+    Entries are packed into numbered prompts of up to
+    SENTIMENT_BATCH_TOKEN_BUDGET estimated tokens. Entries a batch answer
+    leaves out or garbles are retried one by one.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print("Error: GEMINI_API_KEY is not available.")
+        SENTIMENT_OUTCOMES.inc('gemini_batch', 'not_configured')
+        return [{"error": "The sentiment analysis service is not configured."} for _ in texts]
+
+    keys = [hashlib.sha256(text.strip().encode('utf-8')).hexdigest() for text in texts]
+    results = {}
+    missing = {}  # key -> text, so duplicate entries are only sent once
+    for key, text in zip(keys, texts):
+        if key in results or key in missing:
+            continue
+        cached = sentiment_cache.get(key)
+        if cached is not None:
+            SENTIMENT_OUTCOMES.inc('gemini', 'cache_hit')
+            results[key] = cached
+        else:
+            missing[key] = text
+
+    futures = [_batch_pool.submit(_request_batch, batch, api_key) for batch in _pack_batches(list(missing.items()))]
+    for future in futures:
+        results.update(future.result())
+    return [results[key] for key in keys]
+
+def _estimate_tokens(text):
+    # Roughly 4 characters per token, plus the numbering around each entry
+    return len(text) // 4 + 8
+
+def _pack_batches(entries):
+    batches, batch, used = [], [], 0
+    for key, text in entries:
+        cost = _estimate_tokens(text)
+        if batch and (used + cost > SENTIMENT_BATCH_TOKEN_BUDGET or len(batch) >= SENTIMENT_BATCH_MAX_ENTRIES):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append((key, text))
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _request_batch(batch, api_key):
+    """
+    Sends one numbered prompt for the whole batch. Returns {key: result}.
+    Labels are cached as soon as they are known.
+    """
+    if len(batch) == 1:
+        key, text = batch[0]
+        return {key: _in_flight.do(key, _request_and_cache, key, text, api_key)}
+
+    # json.dumps keeps quotes and newlines inside an entry from breaking the numbering
+    numbered = "\n".join(f"[{i}] {json.dumps(text)}" for i, (_, text) in enumerate(batch, 1))
+    prompt = f"""
+    Analyze each of the numbered journal entries below on its own, following these steps:
+    1. First, read the entry carefully to identify any language related to self-harm, severe depression, hopelessness, or immediate distress.
+    2. If any such language is present, you MUST classify the emotion as "Distress".
+    3. If and only if there is NO language of distress, then determine the primary emotion from the list below.
+    4. Finally, determine the intensity of the emotion on a scale of low, medium, or high.
+
+    Respond with exactly one line per entry: the entry number, a colon, then the emotion and its intensity separated by a hyphen.
+    For example:
+    1: Distress-High
+    2: Joy-Low
+
+    Emotion List (only use if no distress is found):
+    Joy, Sadness, Anger, Fear, Surprise, Calm, Hopeful, Anxious, Love
+
+    Journal Entries:
+    {numbered}
+
+    Analysis:
+    """
+
+    model_name = "gemini-1.5-flash-latest"
+    url = f"{GEMINI_API_BASE}/v1beta/models/{model_name}:generateContent?key={api_key}"
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": 0.2, "maxOutputTokens": 12 * len(batch) + 20}
+    }
+
+    try:
+        with gemini_guard.protect(), time_upstream('gemini', 'sentiment_batch'):
+            response = post_json(url, json.dumps(payload))
+            response.raise_for_status()
+        answer = response.json()['candidates'][0]['content']['parts'][0]['text']
+    except UpstreamUnavailable as e:
+        print(f"Skipping Gemini batch of {len(batch)}: {e}")
+        SENTIMENT_OUTCOMES.inc('gemini_batch', 'upstream_unavailable')
+        return {key: {"error": "The sentiment analysis service is temporarily unavailable."} for key, _ in batch}
+    except requests.exceptions.RequestException as e:
+        # Splitting up would only multiply the load on a service that is already failing
+        print(f"Error calling Gemini API for a batch of {len(batch)}: {e}")
+        SENTIMENT_OUTCOMES.inc('gemini_batch', 'request_error')
+        return {key: {"error": "Could not connect to the sentiment analysis service."} for key, _ in batch}
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Error parsing Gemini batch response: {e}")
+        answer = ''
+
+    labels = {}
+    for number, emotion, intensity in _BATCH_LINE.findall(answer):
+        labels.setdefault(int(number), f"{emotion.capitalize()}-{intensity.capitalize()}")
+
+    results = {}
+    for i, (key, text) in enumerate(batch, 1):
+        if i in labels:
+            results[key] = labels[i]
+            sentiment_cache.set(key, labels[i])
+        else:
+            results[key] = _in_flight.do(key, _request_and_cache, key, text, api_key)
+    retried = len(batch) - sum(1 for i in range(1, len(batch) + 1) if i in labels)
+    if retried:
+        print(f"Warning: Gemini batch answer covered {len(batch) - retried}/{len(batch)} entries, retried the rest one by one.")
+        SENTIMENT_OUTCOMES.inc('gemini_batch', 'malformed' if retried == len(batch) else 'partial')
+        FALLBACKS.inc('sentiment_batch', 'individual_calls', amount=retried)
+    else:
+        SENTIMENT_OUTCOMES.inc('gemini_batch', 'ok')
+    return results
+
+def _request_sentiment(text, api_key):
     # Advanced prompt with a safety check (Chain of Thought)
     prompt = f"""
     Analyze the following journal entry by following these steps:
@@ -41,31 +230,40 @@ def analyze_sentiment_with_gemini(text):
     """
     
     model_name = "gemini-1.5-flash-latest"
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
+    url = f"{GEMINI_API_BASE}/v1beta/models/{model_name}:generateContent?key={api_key}"
     
-    headers = {'Content-Type': 'application/json'}
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"temperature": 0.2, "maxOutputTokens": 20}
     }
 
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
+        with gemini_guard.protect(), time_upstream('gemini', 'sentiment'):
+            response = post_json(url, json.dumps(payload))
+            response.raise_for_status()
         
         result = response.json()
         
-        analysis_result = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'Calm-Medium').strip()
+        analysis_result = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '').strip()
         
         if '-' in analysis_result and len(analysis_result.split('-')) == 2:
+            SENTIMENT_OUTCOMES.inc('gemini', 'ok')
             return analysis_result
         else:
             print(f"Warning: Gemini returned an unexpected format: '{analysis_result}'. Defaulting.")
-            return 'Calm-Medium'
+            SENTIMENT_OUTCOMES.inc('gemini', 'unexpected_format')
+            FALLBACKS.inc('sentiment_analysis', 'unexpected_format')
+            return FallbackLabel('Calm-Medium')
 
+    except UpstreamUnavailable as e:
+        print(f"Skipping Gemini sentiment call: {e}")
+        SENTIMENT_OUTCOMES.inc('gemini', 'upstream_unavailable')
+        return {"error": "The sentiment analysis service is temporarily unavailable."}
     except requests.exceptions.RequestException as e:
         print(f"Error calling Gemini API: {e}")
+        SENTIMENT_OUTCOMES.inc('gemini', 'request_error')
         return {"error": "Could not connect to the sentiment analysis service."}
     except (KeyError, IndexError) as e:
         print(f"Error parsing Gemini API response: {e}")
+        SENTIMENT_OUTCOMES.inc('gemini', 'parse_error')
         return {"error": "Invalid response from the sentiment analysis service."}
\ No newline at end of file
@@ -0,0 +1,35 @@
+# serve.py
+"""
+Production entry point. Runs the app under gevent so every connection,
+background task and Gemini/Spotify call is a greenlet instead of an OS
+thread, and one worker can hold thousands of Socket.IO connections.
+
+    python serve.py
+    gunicorn -k gevent -w 1 --worker-connections 5000 -b 0.0.0.0:5000 serve:app
+
+ASYNC_MODE=threading falls back to the plain threaded server.
+
+LISTEN_BACKLOG is how many connections may wait to be accepted. gevent's
+default of 128 resets clients during a burst of new connections; the
+kernel caps it at net.core.somaxconn. Under gunicorn use --backlog.
+"""
+import os
+
+os.environ.setdefault("ASYNC_MODE", "gevent")
+
+if os.environ["ASYNC_MODE"] == "gevent":
+    # Must run before anything imports socket, ssl, threading or requests
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app, socketio  # noqa: E402
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5000"))
+LISTEN_BACKLOG = int(os.getenv("LISTEN_BACKLOG", "2048"))
+
+if __name__ == "__main__":
+    if os.environ["ASYNC_MODE"] == "gevent":
+        socketio.run(app, host=HOST, port=PORT, backlog=LISTEN_BACKLOG)
+    else:
+        socketio.run(app, host=HOST, port=PORT)
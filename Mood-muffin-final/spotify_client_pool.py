@@ -0,0 +1,143 @@
+# spotify_client_pool.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import time_upstream
+from ttl_cache import TTLCache
+
+SPOTIFY_POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", "256"))
+SPOTIFY_REFRESH_MARGIN_SECONDS = int(os.getenv("SPOTIFY_REFRESH_MARGIN_SECONDS", "300"))
+SPOTIFY_REFRESH_INTERVAL_SECONDS = int(os.getenv("SPOTIFY_REFRESH_INTERVAL_SECONDS", "30"))
+# Spotify access tokens live an hour: past that, a user is no longer keeping
+# their token warm and the next request can refresh it on demand
+SPOTIFY_IDLE_SECONDS = int(os.getenv("SPOTIFY_IDLE_SECONDS", "3600"))
+SPOTIFY_DEVICE_CACHE_TTL_SECONDS = float(os.getenv("SPOTIFY_DEVICE_CACHE_TTL_SECONDS", "30"))
+
+# user key -> the device we last saw playing for them. Lets /play skip a
+# transfer_playback when the requested device is already the active one.
+active_devices = TTLCache(maxsize=SPOTIFY_POOL_SIZE * 4, ttl=SPOTIFY_DEVICE_CACHE_TTL_SECONDS)
+
+
+class _PooledClient:
+    __slots__ = ('client', 'oauth', 'cache_handler', 'last_used')
+
+    def __init__(self, client, oauth, cache_handler):
+        self.client = client
+        self.oauth = oauth
+        self.cache_handler = cache_handler
+        self.last_used = time.time()
+
+
+class SpotifyClientPool:
+    """
+    Keeps one authenticated spotipy client per user instead of building a
+    new one (and a new HTTP session) on every request.
+
+    Each client has its own SpotifyOAuth with an in-memory token cache, so
+    spotipy refreshes an expired token by itself on the next call. A
+    background thread also refreshes tokens `refresh_margin` seconds before
+    they expire, so requests don't have to wait on the refresh. Only clients
+    used within `idle_timeout` are refreshed ahead of time; an idle user's
+    token is refreshed on their next request instead. The least recently
+    used clients are dropped once there are more than `maxsize`.
+
+    `oauth_factory(cache_handler)` must return a SpotifyOAuth using that cache handler.
+    """
+
+    def __init__(self, oauth_factory, maxsize=SPOTIFY_POOL_SIZE,
+                 refresh_margin=SPOTIFY_REFRESH_MARGIN_SECONDS, refresh_interval=SPOTIFY_REFRESH_INTERVAL_SECONDS,
+                 idle_timeout=SPOTIFY_IDLE_SECONDS):
+        self.oauth_factory = oauth_factory
+        self.maxsize = maxsize
+        self.refresh_margin = refresh_margin
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def get(self, user_key, token_info):
+        """
+        Returns the pooled client for `user_key`, creating it from `token_info` if needed.
+        """
+        with self._lock:
+            pooled = self._clients.get(user_key)
+            if pooled is not None:
+                self._clients.move_to_end(user_key)
+                pooled.last_used = time.time()
+                return pooled.client
+            # Imported here so workers that never see a Spotify user don't load spotipy
+            import spotipy
+            from spotipy.cache_handler import MemoryCacheHandler
+            cache_handler = MemoryCacheHandler(token_info)
+            oauth = self.oauth_factory(cache_handler)
+            pooled = _PooledClient(spotipy.Spotify(auth_manager=oauth), oauth, cache_handler)
+            self._clients[user_key] = pooled
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='spotify-token-refresh', daemon=True)
+                self._refresher.start()
+        return pooled.client
+
+    def token_info(self, user_key):
+        """
+        Returns the newest token we hold for the user, or None if they aren't pooled.
+        A token that went stale while the user was idle is refreshed first.
+        """
+        pooled = self._clients.get(user_key)
+        if pooled is None:
+            return None
+        pooled.last_used = time.time()
+        token_info = pooled.cache_handler.get_cached_token()
+        if token_info and token_info.get('expires_at', 0) - pooled.last_used < 60:
+            try:
+                with time_upstream('spotify', 'refresh_access_token'):
+                    token_info = pooled.oauth.validate_token(token_info) or token_info
+            except Exception as e:
+                print(f"Error refreshing Spotify token for {user_key}: {e}")
+        return token_info
+
+    def forget(self, user_key):
+        with self._lock:
+            self._clients.pop(user_key, None)
+        active_devices.delete(user_key)
+
+    def refresh_expiring(self, now=None):
+        """
+        Refreshes every recently used token that expires within the margin.
+        Returns how many were refreshed.
+        """
+        now = now or time.time()
+        with self._lock:
+            due = [
+                (user_key, pooled) for user_key, pooled in self._clients.items()
+                if now - pooled.last_used < self.idle_timeout
+                and (pooled.cache_handler.get_cached_token() or {}).get('expires_at', 0) - now < self.refresh_margin
+            ]
+        refreshed = 0
+        for user_key, pooled in due:
+            token_info = pooled.cache_handler.get_cached_token()
+            if not token_info or not token_info.get('refresh_token'):
+                continue
+            try:
+                with time_upstream('spotify', 'refresh_access_token'):
+                    pooled.oauth.refresh_access_token(token_info['refresh_token'])
+                refreshed += 1
+            except Exception as e:
+                print(f"Error refreshing Spotify token for {user_key}: {e}")
+                self.forget(user_key)
+        return refreshed
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh_expiring()
+            except Exception as e:
+                print(f"Error in Spotify token refresh loop: {e}")
@@ -1,4 +1,12 @@
 # spotify_data_fetcher.py
+import threading
+from weakref import WeakKeyDictionary
+
+from metrics import time_upstream
+
+# Pooled clients live for a whole login, so remember each one's market
+_markets = WeakKeyDictionary()
+_markets_lock = threading.Lock()
 
 def get_user_market(sp_client):
     """
@@ -6,13 +14,21 @@ def get_user_market(sp_client):
     """
     if not sp_client:
         return None
+    with _markets_lock:
+        market = _markets.get(sp_client)
+    if market:
+        return market
     try:
-        return sp_client.current_user().get('country')
+        with time_upstream('spotify', 'current_user'):
+            market = sp_client.current_user().get('country')
+        with _markets_lock:
+            _markets[sp_client] = market
+        return market
     except Exception as e:
         print(f"Could not fetch user's market: {e}")
         return None
 
-def get_playlist_uri(sp_client, playlist_name):
+def get_playlist_uri(sp_client, playlist_name, market=None):
     """
     Searches for a playlist by name and returns the URI of the top result.
     """
@@ -21,11 +37,13 @@ def get_playlist_uri(sp_client, playlist_name):
     try:
         print(f"Searching for playlist: {playlist_name}")
         # Try with quoted search term for exact match
-        results = sp_client.search(q=f'playlist:"{playlist_name}"', type='playlist', limit=1)
+        with time_upstream('spotify', 'search'):
+            results = sp_client.search(q=f'playlist:"{playlist_name}"', type='playlist', limit=1, market=market)
         if results is None:
             print(f"API returned no response for {playlist_name}, trying unquoted search")
             # Fallback to unquoted search if quoted fails
-            results = sp_client.search(q=f'playlist:{playlist_name}', type='playlist', limit=1)
+            with time_upstream('spotify', 'search'):
+                results = sp_client.search(q=f'playlist:{playlist_name}', type='playlist', limit=1, market=market)
         if results is None or not isinstance(results, dict):
             print(f"API returned invalid response for {playlist_name}: {results}")
             return None
@@ -4,6 +4,9 @@ import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from flask import session, url_for
 
+from metrics import time_upstream
+from spotify_client_pool import active_devices
+
 SCOPE = "user-top-read user-read-private user-modify-playback-state user-read-playback-state user-library-read user-library-modify playlist-modify-public playlist-modify-private streaming user-read-email"
 
 def get_spotify_oauth():
@@ -25,9 +28,21 @@ def get_current_device_id():
     token_info = session.get('spotify_token_info', None)
     device_id = None
     if token_info:
+        # Answer from the short-lived device cache before asking Spotify
+        cache_key = session.get('spotify_user_key') or token_info['access_token']
+        device_id = active_devices.get(cache_key)
+        if device_id:
+            return device_id
         sp = spotipy.Spotify(auth=token_info['access_token'])
-        devices = sp.devices().get('devices', [])
-        if devices:
+        with time_upstream('spotify', 'devices'):
+            devices = sp.devices().get('devices', [])
+        active = next((device for device in devices if device.get('is_active')), None)
+        if active:
+            device_id = active.get('id')
+            active_devices.set(cache_key, device_id)
+        elif devices:
+            # Nothing is playing: offer a device, but don't cache it as the
+            # active one or /play would skip the transfer to it
             device_id = devices[0].get('id')
     return device_id
 
@@ -43,7 +58,8 @@ def get_spotify_client():
     sp_oauth = get_spotify_oauth()
     try:
         if sp_oauth.is_token_expired(token_info):
-            token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
+            with time_upstream('spotify', 'refresh_access_token'):
+                token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
             session['spotify_token_info'] = token_info
     except Exception as e:
         print(f"Error refreshing Spotify token: {e}")
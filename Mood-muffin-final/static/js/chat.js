@@ -71,6 +71,10 @@ document.addEventListener('DOMContentLoaded', () => {
         appendMessage(data.text, data.from);
     });
 
+    socket.on('rate_limited', (data) => {
+        appendMessage(`You're sending messages too fast, wait ${Math.ceil(data.retry_after)}s and try again.`, 'system');
+    });
+
     socket.on('stranger_disconnected', () => {
         appendMessage('Stranger disconnected.', 'system');
         resetChat();
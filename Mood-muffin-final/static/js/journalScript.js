@@ -20,6 +20,16 @@ document.addEventListener('DOMContentLoaded', () => {
   let lastAnalyzedText = '';
   let currentSentiment = null;
   let isAnalyzing = false;
+  // One journal entry per page visit: the server keeps only its latest text under this id
+  const entryId = window.crypto && crypto.randomUUID
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+
+  // Live analysis: only the edited span is sent, the server keeps the document
+  const socket = typeof io !== 'undefined' ? io() : null;
+  let sentChars = [];     // the text the server has, as code points
+  let docVersion = 0;
+  let deltaTimer = null;
 
   // Playback cycle management
   let playLock = false;
@@ -83,13 +93,54 @@ document.addEventListener('DOMContentLoaded', () => {
       });
   };
 
-  // --- Auto-analysis loop (every 60s) ---
-  setInterval(async () => {
-    const currentText = journalText.value.trim();
-    if (currentText && currentText !== lastAnalyzedText && !isAnalyzing) {
-      await analyzeAndReact(currentText);
-    }
-  }, 60000);
+  // --- Live analysis over Socket.IO ---
+  if (socket) {
+    journalText.addEventListener('input', () => {
+      clearTimeout(deltaTimer);
+      deltaTimer = setTimeout(sendDelta, 400);
+    });
+    // New connection or missed deltas: the server starts over from the full text
+    socket.on('connect', sendFullText);
+    socket.on('journal_resync', sendFullText);
+    socket.on('journal_sentiment', data => reactToSentiment(data.sentiment, data.stage));
+    socket.on('journal_error', data => displayError(data.error));
+  }
+
+  function sendFullText() {
+    sentChars = Array.from(journalText.value);
+    docVersion += 1;
+    socket.emit('journal_delta', { version: docVersion, reset: true, text: journalText.value, entry_id: entryId });
+  }
+
+  function sendDelta() {
+    // Code points on both ends, so emoji count the same in JS and Python
+    const chars = Array.from(journalText.value);
+    let start = 0;
+    while (start < chars.length && start < sentChars.length && chars[start] === sentChars[start]) start++;
+    let tail = 0;
+    while (tail < chars.length - start && tail < sentChars.length - start &&
+           chars[chars.length - 1 - tail] === sentChars[sentChars.length - 1 - tail]) tail++;
+    if (start === chars.length && start === sentChars.length) return;
+
+    docVersion += 1;
+    socket.emit('journal_delta', {
+      version: docVersion,
+      start,
+      end: sentChars.length - tail,
+      text: chars.slice(start, chars.length - tail).join('')
+    });
+    sentChars = chars;
+  }
+
+  // --- Auto-analysis loop (every 60s), when Socket.IO isn't available ---
+  if (!socket) {
+    setInterval(async () => {
+      const currentText = journalText.value.trim();
+      if (currentText && currentText !== lastAnalyzedText && !isAnalyzing) {
+        await analyzeAndReact(currentText);
+      }
+    }, 60000);
+  }
 
   async function analyzeAndReact(textToAnalyze) {
     isAnalyzing = true;
@@ -99,20 +150,15 @@ document.addEventListener('DOMContentLoaded', () => {
       const sentimentResponse = await fetch('/analyze_sentiment', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: textToAnalyze }),
+        body: JSON.stringify({ text: textToAnalyze, entry_id: entryId }),
       });
 
       const sentimentData = await sentimentResponse.json();
+      // Rate limited: forget this text so the next tick tries it again
+      if (sentimentResponse.status === 429) lastAnalyzedText = '';
       if (!sentimentResponse.ok) throw new Error(sentimentData.error || 'Analysis failed.');
 
-      const newSentiment = sentimentData.sentiment;
-      displayResults(newSentiment, sentimentData.stage);
-
-      if (newSentiment !== currentSentiment) {
-        resetPlaybackCycle();   // stop old cycle
-        currentSentiment = newSentiment;
-        await fetchAndPlayNewJourney(currentSentiment);
-      }
+      await reactToSentiment(sentimentData.sentiment, sentimentData.stage);
     } catch (error) {
       displayError(error.message);
     } finally {
@@ -120,6 +166,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  async function reactToSentiment(newSentiment, stage) {
+    displayResults(newSentiment, stage);
+
+    if (newSentiment !== currentSentiment) {
+      resetPlaybackCycle();   // stop old cycle
+      currentSentiment = newSentiment;
+      await fetchAndPlayNewJourney(currentSentiment);
+    }
+  }
+
   async function fetchAndPlayNewJourney(sentiment) {
     if (!deviceId) {
       displayError("Spotify player is not ready yet. Please wait a moment.");
@@ -0,0 +1,136 @@
+# static_assets.py
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request
+
+# Optional: `pip install brotli` to also serve .br, otherwise gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSET_URL_PREFIX = "/assets/"
+# Fingerprinted URLs change whenever the file does, so they can be cached forever
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Pages keep their URL across deploys, so browsers revalidate them (cheap with the ETag)
+PAGE_CACHE_CONTROL = "no-cache"
+
+# Text formats worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Smaller bodies don't shrink enough to pay for the extra header
+MIN_COMPRESS_BYTES = 256
+
+
+class Asset:
+    """
+    One response body, built once: the raw bytes, their precompressed
+    variants and a content hash for the ETag.
+    """
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.encodings = {}
+        if len(body) >= MIN_COMPRESS_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self._add_encoding('br', brotli.compress(body, quality=11))
+            self._add_encoding('gzip', gzip.compress(body, compresslevel=9, mtime=0))
+
+    def _add_encoding(self, encoding, compressed):
+        if len(compressed) < len(self.body):
+            self.encodings[encoding] = compressed
+
+    def response(self, cache_control):
+        """
+        Serves the best encoding the client accepts, or 304 if its copy is current.
+        """
+        accepted = request.accept_encodings
+        encoding = next((e for e in ('br', 'gzip') if e in self.encodings and accepted[e]), None)
+        etag = f"{self.digest}-{encoding}" if encoding else self.digest
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(self.encodings[encoding] if encoding else self.body, mimetype=self.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if self.encodings:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+class AssetManifest:
+    """
+    Fingerprints and precompresses every file under `static_dir` once, at
+    startup. `url(filename)` gives the fingerprinted URL, e.g.
+    js/chat.js -> /assets/js/chat.3f2a9c1e0b7d4a65.js, and `get(path)` the
+    Asset behind it. Files added after startup are not picked up.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR, prefix=ASSET_URL_PREFIX):
+        self.prefix = prefix
+        self._urls = {}     # static filename -> fingerprinted path
+        self._assets = {}   # fingerprinted path -> Asset
+        for root, _, files in os.walk(static_dir):
+            for name in files:
+                full_path = os.path.join(root, name)
+                filename = os.path.relpath(full_path, static_dir).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    body = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                asset = Asset(body, mimetype)
+                stem, ext = os.path.splitext(filename)
+                fingerprinted = f"{stem}.{asset.digest}{ext}"
+                self._urls[filename] = fingerprinted
+                self._assets[fingerprinted] = asset
+
+    def url(self, filename):
+        fingerprinted = self._urls.get(filename)
+        if fingerprinted is None:
+            # Unknown files still resolve, just without the long-lived caching
+            return f"/static/{filename}"
+        return self.prefix + fingerprinted
+
+    def get(self, path):
+        return self._assets.get(path)
+
+    def stats(self):
+        """
+        Asset count and total bytes per encoding, for the startup log.
+        """
+        encodings = ('gzip', 'br') if brotli is not None else ('gzip',)
+        totals = dict.fromkeys(('identity',) + encodings, 0)
+        for asset in self._assets.values():
+            totals['identity'] += len(asset.body)
+            for encoding in encodings:
+                totals[encoding] += len(asset.encodings.get(encoding, asset.body))
+        return {'assets': len(self._assets), 'bytes': totals}
+
+
+class PageCache:
+    """
+    Rendered pages that only depend on their template, kept as Assets so
+    they are also served precompressed and with an ETag. Disabled while
+    templates are being edited (debug mode), so changes still show up.
+    """
+
+    def __init__(self):
+        self._pages = {}
+
+    def get(self, key, render, enabled=True):
+        if not enabled:
+            return Asset(render().encode('utf-8'), 'text/html')
+        page = self._pages.get(key)
+        if page is None:
+            # Racing first renders produce identical pages, whichever lands last wins
+            page = self._pages[key] = Asset(render().encode('utf-8'), 'text/html')
+        return page
+
+    def clear(self):
+        self._pages.clear()
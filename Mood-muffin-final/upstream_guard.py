@@ -0,0 +1,166 @@
+# upstream_guard.py
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import UPSTREAM_REJECTIONS
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised instead of calling the upstream when the circuit is open or no
+    concurrency slot frees up in time. Callers treat it like any other
+    upstream error and use their fallback.
+    """
+
+    def __init__(self, service, reason):
+        super().__init__(f"{service} unavailable ({reason})")
+        self.service = service
+        self.reason = reason
+
+
+class UpstreamGuard:
+    """
+    Adaptive concurrency limit plus circuit breaker for one upstream service.
+
+    The limit follows AIMD: each call that succeeds within `latency_target`
+    adds 1/limit (about +1 per full window of calls); a failure or a slow
+    call halves it, at most once per `decrease_interval`. Callers wait up
+    to `queue_timeout` for a slot and are rejected after that, so a slow
+    upstream can't tie up every worker.
+
+    The breaker opens when at least `min_calls` of the last `window` calls
+    finished and `failure_ratio` of them failed. While open every call is
+    rejected straight away. After `open_seconds` one probe call is let
+    through (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, service, initial_limit=8, min_limit=1, max_limit=64, latency_target=2.0,
+                 queue_timeout=0.25, decrease_interval=1.0, window=20, min_calls=10,
+                 failure_ratio=0.5, open_seconds=15.0):
+        self.service = service
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.decrease_interval = decrease_interval
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._outcomes = deque(maxlen=window)   # True for failures
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def protect(self):
+        """
+        Wraps one upstream call. Raises UpstreamUnavailable instead of
+        running the body when the call isn't allowed.
+        """
+        probe = self._acquire()
+        start = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._release(probe, failed, time.monotonic() - start)
+
+    def call(self, fn, *args, **kwargs):
+        with self.protect():
+            return fn(*args, **kwargs)
+
+    def _acquire(self):
+        with self._cond:
+            now = time.monotonic()
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._reject('circuit_open')
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                # Only one probe at a time; everyone else keeps failing fast
+                if self._probing:
+                    self._reject('circuit_open')
+                self._probing = True
+                self._in_flight += 1
+                return True
+
+            deadline = now + self.queue_timeout
+            while self._in_flight >= int(self._limit):
+                if self._state != CLOSED:
+                    self._reject('circuit_open')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject('concurrency_limit')
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            return False
+
+    def _release(self, probe, failed, elapsed):
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                if failed:
+                    self._trip(now)
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                self._cond.notify_all()
+                return
+
+            self._outcomes.append(failed)
+            if failed or elapsed > self.latency_target:
+                if now - self._last_decrease >= self.decrease_interval:
+                    self._limit = max(self.min_limit, self._limit / 2)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            failures = sum(self._outcomes)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures >= self.failure_ratio * len(self._outcomes)):
+                print(f"Circuit for {self.service} opened after {failures}/{len(self._outcomes)} failed calls")
+                self._trip(now)
+            self._cond.notify()
+
+    def _trip(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+
+    def _reject(self, reason):
+        UPSTREAM_REJECTIONS.inc(self.service, reason)
+        raise UpstreamUnavailable(self.service, reason)
+
+    def snapshot(self):
+        """
+        Current state for /metrics: breaker state, limit and calls in flight.
+        """
+        with self._cond:
+            state = self._state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            return {'state': state, 'limit': int(self._limit), 'in_flight': self._in_flight}
+
+
+# One guard for every Gemini call in the process: SDK moderation checks and REST sentiment calls
+gemini_guard = UpstreamGuard(
+    'gemini',
+    initial_limit=int(os.getenv("GEMINI_CONCURRENCY_INITIAL", "8")),
+    max_limit=int(os.getenv("GEMINI_CONCURRENCY_MAX", "64")),
+    latency_target=float(os.getenv("GEMINI_LATENCY_TARGET_SECONDS", "2.0")),
+    queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "0.25")),
+    open_seconds=float(os.getenv("GEMINI_CIRCUIT_OPEN_SECONDS", "15"))
+)
@@ -0,0 +1,40 @@
+# verdict_cache.py
+import os
+import re
+import unicodedata
+
+from ttl_cache import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# One cache for every moderation path, keys are namespaced per checker
+verdict_cache = TTLCache(
+    maxsize=int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "20000")),
+    ttl=float(os.getenv("VERDICT_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(os.getenv("VERDICT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+)
+
+
+def normalize_message(message):
+    """
+    Folds case, Unicode width, punctuation and whitespace so near-identical
+    messages ("I want to die!!", "i  want to die") share a cache key.
+    """
+    text = unicodedata.normalize('NFKC', message).casefold()
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def cached_verdict(namespace, message, compute):
+    """
+    Returns the cached verdict for `message` or calls `compute(message)` and
+    stores the result. `compute` should raise on errors so fallback verdicts
+    never end up in the cache.
+    """
+    key = (namespace, normalize_message(message))
+    verdict = verdict_cache.get(key)
+    if verdict is None:
+        verdict = compute(message)
+        verdict_cache.set(key, verdict)
+    return verdict